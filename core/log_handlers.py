@@ -0,0 +1,63 @@
+"""
+Logging handlers used by settings.LOGGING.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueueConsoleHandler(QueueHandler):
+    """
+    Console handler that keeps stderr writes off the calling thread.
+
+    Records are formatted where they are logged (so the configured
+    formatter applies) and then handed to a background listener thread,
+    which does the actual write. A log call in a view costs an enqueue.
+
+    The listener starts on the first record a process logs. Logging is
+    configured before fork() under prefork servers (gunicorn --preload),
+    and threads do not survive a fork, so each child drops the inherited
+    listener and starts its own.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self._stream = stream
+        self._listener = None
+        self._start_lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+        # Stop (and so drain) the listener at exit even if logging.shutdown()
+        # no longer knows about this handler.
+        atexit.register(self._stop_listener)
+
+    def _after_fork(self):
+        # The parent's listener thread and lock state did not come along;
+        # records still queued there are the parent's to write.
+        self.queue = queue.SimpleQueue()
+        self._listener = None
+        self._start_lock = threading.Lock()
+
+    def enqueue(self, record):
+        if self._listener is None:
+            with self._start_lock:
+                if self._listener is None:
+                    listener = QueueListener(self.queue, logging.StreamHandler(self._stream))
+                    listener.start()
+                    self._listener = listener
+        super().enqueue(record)
+
+    def _stop_listener(self):
+        with self._start_lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+
+    def close(self):
+        # logging.shutdown() closes handlers at exit; stopping the listener
+        # drains whatever is still queued.
+        self._stop_listener()
+        super().close()
@@ -1,38 +1,87 @@
 from pathlib import Path
+import logging
 import os
-from dotenv import load_dotenv
+
+# abspath() instead of resolve(): no realpath() stat walk at import.
+BASE_DIR = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # ---------------------------------------------------------------------
 # Load .env early (API/device ingest, SMTP creds, etc.)
+# Only BASE_DIR/.env is read; there is no find_dotenv() walk up the tree,
+# so a container without the file costs a single stat.
+# Parsed once per process tree: the sentinel records the .env mtime, so
+# child processes (runserver autoreloader, gunicorn workers, spawned
+# commands) inherit the populated environ and skip re-reading the file
+# until it actually changes.
+#
+# Set AIAERO_SKIP_DOTENV=1 where the environment is already injected
+# (Docker, systemd): python-dotenv is then never imported.
 # ---------------------------------------------------------------------
-load_dotenv()
+_DOTENV_SENTINEL = "_AIAERO_DOTENV_LOADED"
+if os.getenv("AIAERO_SKIP_DOTENV") != "1":
+    try:
+        _dotenv_stamp = str(os.stat(BASE_DIR / ".env").st_mtime_ns)
+    except OSError:
+        _dotenv_stamp = ""
+    if os.environ.get(_DOTENV_SENTINEL) != _dotenv_stamp:
+        if _dotenv_stamp:
+            from dotenv import load_dotenv
+
+            load_dotenv(BASE_DIR / ".env")
+        os.environ[_DOTENV_SENTINEL] = _dotenv_stamp
+
+# One snapshot of the environment (with .env applied). Every setting below
+# reads it through _env(), which strips whitespace and treats an empty
+# value as unset, so fallback chains need no extra .strip()/or juggling.
+_ENV = os.environ.copy()
+
+
+def _env(key: str, default: str = "") -> str:
+    return (_ENV.get(key) or "").strip() or default
+
+
+def _env_int(key: str, default: int) -> int:
+    """Integer setting; an unset or malformed value falls back to default."""
+    value = _env(key)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logging.getLogger(__name__).warning(
+            "Ignoring non-integer %s=%r, using %s", key, value, default
+        )
+        return default
+
+
+def _split_csv(key: str, default=()) -> list:
+    """Comma-separated setting as a list; blank items are dropped."""
+    items = [p for p in (p.strip() for p in _env(key).split(",")) if p]
+    return items or list(default)
+
 
 # =============================
 # 🔐 Django Basic Settings
 # =============================
 
-BASE_DIR = Path(__file__).resolve().parent.parent
+SECRET_KEY = _env("DJANGO_SECRET_KEY", "django-insecure-dev-only")
+DEBUG = _env("DJANGO_DEBUG", "true").lower() == "true"
 
-SECRET_KEY = os.getenv("DJANGO_SECRET_KEY", "django-insecure-dev-only")
-DEBUG = os.getenv("DJANGO_DEBUG", "true").lower() == "true"
-
-ALLOWED_HOSTS = [
-    h.strip() for h in os.getenv("ALLOWED_HOSTS", "*").split(",") if h.strip()
-] or ["*"]
+ALLOWED_HOSTS = _split_csv("ALLOWED_HOSTS", ["*"])
 
 # Optional if you reverse-proxy with HTTPS
-CSRF_TRUSTED_ORIGINS = [
-    o.strip()
-    for o in os.getenv("CSRF_TRUSTED_ORIGINS", "").split(",")
-    if o.strip()
-]
+CSRF_TRUSTED_ORIGINS = _split_csv("CSRF_TRUSTED_ORIGINS")
 
 # =============================
 # 📦 Installed apps / middleware
 # =============================
 
+# The admin is only loaded in DEBUG or when ENABLE_ADMIN=1, so production
+# boots skip its app/URL setup. django.contrib.messages stays: the account
+# and password views report results through it.
+ENABLE_ADMIN = DEBUG or _env("ENABLE_ADMIN") == "1"
+
 INSTALLED_APPS = [
-    "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -43,6 +92,8 @@ INSTALLED_APPS = [
     # Local app
     "telemetry",
 ]
+if ENABLE_ADMIN:
+    INSTALLED_APPS.insert(0, "django.contrib.admin")
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
@@ -82,20 +133,67 @@ TEMPLATES = [
 WSGI_APPLICATION = "core.wsgi.application"
 ASGI_APPLICATION = "core.asgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+# Shared Redis (channel layer); leave unset for a single-process setup.
+REDIS_URL = _env("REDIS_URL")
+
+# The in-memory layer is per-process, so messages never cross workers.
+# With REDIS_URL set, all ASGI workers share one layer (needs channels-redis).
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [REDIS_URL],
+                "capacity": 1500,
+                "expiry": 10,
+            },
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        }
+    }
+
+# Gateway responses cached by the dashboard APIs. Redis when REDIS_URL is
+# set (shared by all workers; needs redis-py), per-process memory otherwise.
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "aiaero",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
     }
-}
 
 # =============================
 # 🗄 Django DB (for users, Device, Reading…)
 # =============================
 
+# WAL lets dashboard reads proceed while /ingest/v1 writes, and with
+# synchronous=NORMAL commits fsync at checkpoints instead of every write.
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA mmap_size=268435456;"
+                "PRAGMA cache_size=-65536;"
+                "PRAGMA temp_store=MEMORY;"
+            ),
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
@@ -133,8 +231,13 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # 📊 Excel exports
 # =============================
 
+# Created by TelemetryConfig.ready(), not at settings import.
 EXCEL_DIR = BASE_DIR / "excel_exports"
-EXCEL_DIR.mkdir(exist_ok=True)
+
+# Behind nginx, set this to an `internal;` location aliased to EXCEL_DIR
+# (e.g. /_protected/excel/) and workbook downloads go out via
+# X-Accel-Redirect instead of being streamed through Django.
+EXCEL_XACCEL_PREFIX = _env("EXCEL_XACCEL_PREFIX")
 
 # =====================================================================
 # LIVE DATA SOURCES (LoRa + GSM)
@@ -142,64 +245,76 @@ EXCEL_DIR.mkdir(exist_ok=True)
 
 # (A) Ingest directly to Django (for LoRa receiver etc.)
 #     Devices POST to /ingest/v1 with header: x-ingest-secret: <INGEST_SECRET>
-INGEST_SECRET = os.getenv("INGEST_SECRET", "aiaero_4444_secure_key").strip()
+INGEST_SECRET = _env("INGEST_SECRET", "aiaero_4444_secure_key")
 
 # Consider a device "online" if last post < N minutes
-DEVICES_MAX_AGE_MIN = int(os.getenv("DEVICES_MAX_AGE_MIN", "60"))
+DEVICES_MAX_AGE_MIN = _env_int("DEVICES_MAX_AGE_MIN", 60)
 
 # ---------------------------------------------------------------------
-# (B) LoRa Gateway APIs (your local HTTP endpoints)
+# Gateway URLs + shared secret, sections (B) and (C).
+# `manage.py freeze_settings` snapshots the resolved values into
+# core/settings_frozen.py; when that file is present it is used as-is and
+# the env fallback chains below are skipped.
 # ---------------------------------------------------------------------
+try:
+    from .settings_frozen import *  # noqa: F401,F403
+    _frozen_gateways = True
+except ImportError:
+    _frozen_gateways = False
+
+if not _frozen_gateways:
+    # -----------------------------------------------------------------
+    # (B) LoRa Gateway APIs (your local HTTP endpoints)
+    # -----------------------------------------------------------------
+
+    # Default base if nothing is in .env (lower-case: an intermediate only,
+    # so django.conf.Settings does not copy it onto the settings object)
+    _default_vitals_base = _env(
+        "DEFAULT_VITALS_BASE", "http://192.168.0.50:8000/vitals"
+    )
 
-# Default base if nothing is in .env
-DEFAULT_VITALS_BASE = os.getenv(
-    "DEFAULT_VITALS_BASE", "http://192.168.0.50:8000/vitals"
-).strip()
-
-# Main readings endpoint
-VITALS_API_URL = (
-    os.getenv("VITALS_API_URL")
-    or os.getenv("VITALS_GET_URL")
-    or DEFAULT_VITALS_BASE
-).strip()
-
-# Devices registry endpoint
-VITALS_DEVICES_URL = (os.getenv("VITALS_DEVICES_URL") or "").strip()
-if not VITALS_DEVICES_URL:
-    # If API URL already ends with /devices, keep it
-    if VITALS_API_URL.endswith("/devices"):
-        VITALS_DEVICES_URL = VITALS_API_URL
-    # If API URL ends with /vitals, append /devices
-    elif VITALS_API_URL.endswith("/vitals"):
-        VITALS_DEVICES_URL = VITALS_API_URL.rstrip("/") + "/devices"
-    else:
-        VITALS_DEVICES_URL = VITALS_API_URL.rstrip("/") + "/devices"
+    # Main readings endpoint
+    VITALS_API_URL = (
+        _env("VITALS_API_URL")
+        or _env("VITALS_GET_URL")
+        or _default_vitals_base
+    )
 
-# ---------------------------------------------------------------------
-# (C) GSM / Cellular Gateway APIs (local)
-# ---------------------------------------------------------------------
+    # Devices registry endpoint: keep an API URL that already ends with
+    # /devices, otherwise append /devices to it.
+    VITALS_DEVICES_URL = _env("VITALS_DEVICES_URL") or (
+        VITALS_API_URL
+        if VITALS_API_URL.endswith("/devices")
+        else VITALS_API_URL.rstrip("/") + "/devices"
+    )
+
+    # -----------------------------------------------------------------
+    # (C) GSM / Cellular Gateway APIs (local)
+    # -----------------------------------------------------------------
+
+    # Ingest URL used by GSM collector (if your views call it)
+    GSM_INGEST_URL = _env("VITALS_GSM_INGEST_URL") or _env("GSM_INGEST_URL")
 
-# Ingest URL used by GSM collector (if your views call it)
-GSM_INGEST_URL = (
-    os.getenv("VITALS_GSM_INGEST_URL")
-    or os.getenv("GSM_INGEST_URL", "")
-).strip()
-
-# API + devices listing for GSM (if you ever query them separately)
-VITALS_GSM_API_URL = os.getenv("VITALS_GSM_API_URL", "").strip()
-VITALS_GSM_DEVICES_URL = (
-    os.getenv("VITALS_GSM_DEVICES_URL", "") or VITALS_GSM_API_URL
-).strip()
-
-# Shared secret for LoRa + GSM APIs
-VITALS_API_SECRET = (
-    os.getenv("VITALS_API_SECRET")
-    or os.getenv("VITALS_SECRET")
-    or INGEST_SECRET
-).strip()
+    # API + devices listing for GSM (if you ever query them separately)
+    VITALS_GSM_API_URL = _env("VITALS_GSM_API_URL")
+    VITALS_GSM_DEVICES_URL = _env("VITALS_GSM_DEVICES_URL") or VITALS_GSM_API_URL
+
+    # Shared secret for LoRa + GSM APIs
+    VITALS_API_SECRET = (
+        _env("VITALS_API_SECRET")
+        or _env("VITALS_SECRET")
+        or INGEST_SECRET
+    )
 
 # HTTP timeout for Django → gateway requests (seconds)
-VITALS_API_TIMEOUT = int(os.getenv("VITALS_API_TIMEOUT", "10"))
+VITALS_API_TIMEOUT = _env_int("VITALS_API_TIMEOUT", 10)
+
+# Shortest polling interval advertised to /api/current clients
+# (Cache-Control max-age); ?poll=N can only ask for a longer one.
+VITALS_MIN_POLL_SECONDS = _env_int("VITALS_MIN_POLL_SECONDS", 3)
+
+# How long the tracking page reuses the device list read from DuckDB
+TRACKING_DEVICES_CACHE_SECONDS = _env_int("TRACKING_DEVICES_CACHE_SECONDS", 60)
 
 # =============================
 # 🪵 Logging
@@ -215,14 +330,16 @@ LOGGING = {
         },
     },
     "handlers": {
+        # Formats on the calling thread, writes to stderr from a listener
+        # thread so request handlers never block on console I/O.
         "console": {
-            "class": "logging.StreamHandler",
+            "class": "core.log_handlers.QueueConsoleHandler",
             "formatter": "verbose",
         }
     },
     "root": {
         "handlers": ["console"],
-        "level": os.getenv("LOG_LEVEL", "INFO"),
+        "level": _env("LOG_LEVEL", "INFO"),
     },
 }
 
@@ -230,36 +347,32 @@ LOGGING = {
 # ✉️ Email (password reset, etc.)
 # =============================
 
-EMAIL_BACKEND = os.getenv(
+EMAIL_BACKEND = _env(
     "EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend"
 )
-EMAIL_HOST = os.getenv("EMAIL_HOST", "")
-EMAIL_PORT = int(
-    os.getenv(
-        "EMAIL_PORT",
-        "587" if EMAIL_BACKEND.endswith("smtp.EmailBackend") else "25",
-    )
+EMAIL_HOST = _env("EMAIL_HOST")
+EMAIL_PORT = _env_int(
+    "EMAIL_PORT",
+    587 if EMAIL_BACKEND.endswith("smtp.EmailBackend") else 25,
 )
-EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
-EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
-EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() == "true"
-EMAIL_USE_SSL = os.getenv("EMAIL_USE_SSL", "false").lower() == "true"
-DEFAULT_FROM_EMAIL = os.getenv(
+EMAIL_HOST_USER = _env("EMAIL_HOST_USER")
+EMAIL_HOST_PASSWORD = _env("EMAIL_HOST_PASSWORD")
+EMAIL_USE_TLS = _env("EMAIL_USE_TLS", "true").lower() == "true"
+EMAIL_USE_SSL = _env("EMAIL_USE_SSL", "false").lower() == "true"
+DEFAULT_FROM_EMAIL = _env(
     "DEFAULT_FROM_EMAIL", EMAIL_HOST_USER or "webmaster@localhost"
 )
-PASSWORD_RESET_TIMEOUT = int(
-    os.getenv("PASSWORD_RESET_TIMEOUT", str(60 * 60 * 24))
-)
+PASSWORD_RESET_TIMEOUT = _env_int("PASSWORD_RESET_TIMEOUT", 60 * 60 * 24)
 
 # =============================
 # 🧊 AWS / DynamoDB (legacy – optional)
 # =============================
 
 AWS_REGION = "ap-south-1"
-DYNAMODB_READINGS_TABLE = os.getenv(
+DYNAMODB_READINGS_TABLE = _env(
     "DYNAMODB_READINGS_TABLE", "aiaero_4444_secure_key"
 )
-DYNAMODB_LATEST_TABLE = os.getenv(
+DYNAMODB_LATEST_TABLE = _env(
     "DYNAMODB_LATEST_TABLE", "vitals_latest"
 )
 
@@ -269,7 +382,12 @@ DYNAMODB_LATEST_TABLE = os.getenv(
 
 # Path to your local DuckDB file (used by views for vitals_latest, etc.)
 # In .env you have: DUCKDB_PATH=F:/ocf_fss
-_duck_path = os.getenv("DUCKDB_PATH", "").strip()
-if _duck_path and not os.path.isabs(_duck_path):
-    _duck_path = str(BASE_DIR / _duck_path)
-DUCKDB_PATH = _duck_path
+# Relative paths are resolved against BASE_DIR by
+# telemetry.duckdb_utils.get_duckdb_path() on first use.
+DUCKDB_PATH = _env("DUCKDB_PATH")
+
+# Keep one DuckDB handle open per process instead of a connection per
+# request. It holds the file lock until the process exits, which blocks the
+# external sync job from writing, so only set DUCKDB_SHARED_CONNECTION=1
+# where the dashboard is the only process writing the database.
+DUCKDB_SHARED_CONNECTION = _env("DUCKDB_SHARED_CONNECTION") == "1"
@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
@@ -6,9 +6,6 @@ from django.conf.urls.static import static
 from telemetry import views
 
 urlpatterns = [
-    # ------------------ Admin ------------------
-    path("admin/", admin.site.urls),
-
     # ------------------ Authentication ------------------
     path("accounts/signup/", views.signup, name="signup"),
     path("accounts/account/", views.account, name="account"),
@@ -78,6 +75,12 @@ urlpatterns = [
     ),
 ]
 
+# ------------------ Admin (DEBUG or ENABLE_ADMIN=1) ------------------
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path("admin/", admin.site.urls))
+
 # ------------------ Static & Media (Development Only) ------------------
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
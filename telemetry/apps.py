@@ -1,6 +1,16 @@
+from pathlib import Path
+
 from django.apps import AppConfig
 
 
 class TelemetryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'telemetry'
+
+    def ready(self):
+        from django.conf import settings
+
+        # Created once at app init instead of on every settings import.
+        excel_dir = getattr(settings, "EXCEL_DIR", None)
+        if excel_dir:
+            Path(excel_dir).mkdir(exist_ok=True)
@@ -1,13 +1,21 @@
 # telemetry/duckdb_utils.py
+import atexit
 import os
 import logging
+import threading
+from functools import cache
 
-import duckdb
 from django.conf import settings
 
 log = logging.getLogger(__name__)
 
+# Only used with DUCKDB_SHARED_CONNECTION: one DuckDB database handle per
+# process and access mode, keyed by read_only; callers get cursors on it.
+_conns = {}
+_conn_lock = threading.Lock()
 
+
+@cache
 def get_duckdb_path() -> str:
     """
     Resolve the DuckDB database path.
@@ -16,26 +24,77 @@ def get_duckdb_path() -> str:
     1) settings.DUCKDB_PATH
     2) environment variable DUCKDB_PATH
     3) fallback file in BASE_DIR
+
+    Relative paths are taken relative to BASE_DIR. The result is cached for
+    the process (call get_duckdb_path.cache_clear() after changing settings).
     """
     path = getattr(settings, "DUCKDB_PATH", None) or os.environ.get("DUCKDB_PATH")
+    base_dir = str(getattr(settings, "BASE_DIR", os.getcwd()))
 
     if not path:
-        base_dir = getattr(settings, "BASE_DIR", os.getcwd())
-        path = os.path.join(str(base_dir), "aiaero_local.duckdb")
+        path = os.path.join(base_dir, "aiaero_local.duckdb")
+    elif not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+
+    # If DUCKDB_PATH accidentally points to a *folder*,
+    # put a default file inside that folder.
+    if os.path.isdir(path):
+        path = os.path.join(path, "aiaero_connect.duckdb")
 
     return path
 
 
-def get_duckdb_conn():
+def _connect(read_only: bool):
+    # Imported here so loading the URLconf (manage.py check, migrate,
+    # any command) does not pay for the DuckDB extension.
+    import duckdb
+
+    db_path = get_duckdb_path()
+    if read_only and not os.path.exists(db_path):
+        # A read-only open cannot create the file. On a fresh deploy, open
+        # it read-write once so callers see an empty database, as before.
+        read_only = False
+    log.debug("Opening DuckDB at %s (read_only=%s)", db_path, read_only)
+    return duckdb.connect(db_path, read_only=read_only)
+
+
+def _shared_conn(read_only: bool):
     """
-    Open a DuckDB connection using the resolved path.
+    Open the process-wide DuckDB connection for this access mode on first use.
     """
-    db_path = get_duckdb_path()
+    conn = _conns.get(read_only)
+    if conn is not None:
+        return conn
 
-    # If DUCKDB_PATH accidentally points to a *folder*,
-    # put a default file inside that folder.
-    if os.path.isdir(db_path):
-        db_path = os.path.join(db_path, "aiaero_connect.duckdb")
+    with _conn_lock:
+        conn = _conns.get(read_only)
+        if conn is None:
+            conn = _connect(read_only)
+            atexit.register(conn.close)
+            _conns[read_only] = conn
+    return conn
 
-    log.debug("Opening DuckDB at %s", db_path)
-    return duckdb.connect(db_path, read_only=False)
+
+def get_duckdb_conn(read_only: bool = True):
+    """
+    Return a DuckDB handle, to be used as ``with get_duckdb_conn() as con:``.
+
+    DuckDB lets either one read-write process or several read-only
+    processes open a file, never both. By default every call therefore
+    opens its own connection, closed when the ``with`` block exits, so the
+    file lock is only held while a query runs and the external sync job
+    can write between requests.
+
+    With settings.DUCKDB_SHARED_CONNECTION the file is opened once per
+    process and each caller gets its own cursor on it (no catalog load or
+    WAL replay per request). That lock is held for the life of the
+    process, so only enable it where the dashboard is the only process
+    that writes the database.
+
+    Dashboard views only read, so the default is a read-only handle: it
+    takes a shared file lock instead of an exclusive one, letting several
+    worker processes read at once. Pass read_only=False to write.
+    """
+    if getattr(settings, "DUCKDB_SHARED_CONNECTION", False):
+        return _shared_conn(read_only).cursor()
+    return _connect(read_only)
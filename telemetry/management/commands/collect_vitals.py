@@ -1,40 +1,72 @@
 import json
+import os
 from pathlib import Path
 from datetime import datetime
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from openpyxl import Workbook, load_workbook
 from openpyxl.utils import get_column_letter
 
 from telemetry.models import Soldier, VitalReading
 
-
-def append_row_xlsx(xlsx_path: Path, sheet_name: str, header: list, row: list):
+# One pooled session per process: the keep-alive connection is reused across
+# retries and across runs when the command is called from a long-lived host.
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=1, pool_maxsize=1,
+    max_retries=Retry(total=3, backoff_factor=0.3),
+)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
+
+def open_workbook(xlsx_path: Path):
+    """
+    Load the day's workbook (or start a new one) and return it together with
+    a {sheet name: worksheet} cache used by get_sheet().
+    """
     if xlsx_path.exists():
         wb = load_workbook(xlsx_path)
     else:
         wb = Workbook()
-        # openpyxl creates a default sheet; we'll remove it after first save if needed
+        # openpyxl creates a default sheet; every sheet here is per soldier
+        wb.remove(wb.active)
+    return wb, {ws.title: ws for ws in wb.worksheets}
+
 
-    ws = wb[sheet_name] if sheet_name in wb.sheetnames else wb.create_sheet(title=sheet_name)
+def get_sheet(wb, sheets: dict, sheet_name: str, header: list):
+    """
+    Return the worksheet for sheet_name, creating it (with a bold header row)
+    on first use.
+    """
+    ws = sheets.get(sheet_name)
+    if ws is not None:
+        return ws
 
-    if ws.max_row == 1 and ws.max_column == 1 and ws["A1"].value is None:
-        ws.append(header)
-        # make header bold & auto-col width-ish
-        for i, h in enumerate(header, start=1):
-            ws.cell(row=1, column=i).font = ws.cell(row=1, column=i).font.copy(bold=True)
-            ws.column_dimensions[get_column_letter(i)].width = max(12, len(str(h)) + 2)
+    # Sheets loaded from disk already have their header; only a sheet
+    # created here needs one, so there is no per-call dimension probe.
+    ws = wb.create_sheet(title=sheet_name)
+    ws.append(header)
+    # make header bold & auto-col width-ish
+    for i, h in enumerate(header, start=1):
+        ws.cell(row=1, column=i).font = ws.cell(row=1, column=i).font.copy(bold=True)
+        ws.column_dimensions[get_column_letter(i)].width = max(12, len(str(h)) + 2)
 
-    ws.append(row)
+    sheets[sheet_name] = ws
+    return ws
 
-    # remove the default "Sheet" if it’s empty and not our target
-    if "Sheet" in wb.sheetnames and wb["Sheet"].max_row == 1 and wb["Sheet"]["A1"].value is None:
-        std = wb["Sheet"]; wb.remove(std)
 
-    wb.save(xlsx_path)
+def save_workbook_atomic(wb, xlsx_path: Path):
+    # write next to the target and swap in, so readers never see a half-written file
+    tmp_path = xlsx_path.with_suffix(".tmp")
+    wb.save(tmp_path)
+    os.replace(tmp_path, xlsx_path)
 
 
 class Command(BaseCommand):
@@ -44,7 +76,7 @@ class Command(BaseCommand):
         # 1) FETCH CURRENT from your API (replace URL when real API is ready)
         url = "http://127.0.0.1:8000/api/current/"  # change to your gateway if needed
         try:
-            r = requests.get(url, timeout=10)
+            r = _session.get(url, timeout=10)
             r.raise_for_status()
             data = r.json()
             items = data.get("items", [])
@@ -55,33 +87,49 @@ class Command(BaseCommand):
         now = timezone.now()
 
         # 2) Ensure Soldiers exist & write readings to DB
-        created_count = 0
+        # (one lookup, one insert for new soldiers, one batched insert for readings)
+        valid = []
         for it in items:
             sid = int(it.get("person_id") or 0) or None
-            name = it.get("person") or f"Soldier {sid or '?'}"
-            device_id = it.get("device_id") or f"NODE_{sid or 'XX'}"
-
             if sid is None:
                 # skip items without a person_id (we need it as PK)
                 continue
-
-            soldier, _ = Soldier.objects.get_or_create(
-                id=sid,
-                defaults={"name": name, "device_id": device_id},
-            )
-            # keep name/device fresh if changed
-            if soldier.name != name or soldier.device_id != device_id:
-                soldier.name = name
-                soldier.device_id = device_id
-                soldier.save(update_fields=["name", "device_id"])
-
-            vr = VitalReading.objects.create(
-                soldier=soldier, ts=now,
-                hr=it.get("hr"), spo2=it.get("spo2"), temp=it.get("temp"),
-                bp_sys=it.get("bp_sys"), bp_dia=it.get("bp_dia"),
-                battery=it.get("battery"), rssi=it.get("rssi"),
-            )
-            created_count += 1
+            name = it.get("person") or f"Soldier {sid}"
+            device_id = it.get("device_id") or f"NODE_{sid}"
+            valid.append((sid, name, device_id, it))
+
+        with transaction.atomic():
+            existing = Soldier.objects.in_bulk([sid for sid, *_ in valid])
+
+            missing = {}
+            changed = {}
+            for sid, name, device_id, _ in valid:
+                soldier = existing.get(sid)
+                if soldier is None:
+                    missing[sid] = Soldier(id=sid, name=name, device_id=device_id)
+                # keep name/device fresh if changed
+                elif soldier.name != name or soldier.device_id != device_id:
+                    soldier.name = name
+                    soldier.device_id = device_id
+                    changed[sid] = soldier
+            if missing:
+                Soldier.objects.bulk_create(missing.values(), ignore_conflicts=True)
+            if changed:
+                Soldier.objects.bulk_update(
+                    changed.values(), fields=["name", "device_id"], batch_size=500
+                )
+
+            readings = [
+                VitalReading(
+                    soldier_id=sid, ts=now,
+                    hr=it.get("hr"), spo2=it.get("spo2"), temp=it.get("temp"),
+                    bp_sys=it.get("bp_sys"), bp_dia=it.get("bp_dia"),
+                    battery=it.get("battery"), rssi=it.get("rssi"),
+                )
+                for sid, _, _, it in valid
+            ]
+            VitalReading.objects.bulk_create(readings, batch_size=500)
+        created_count = len(readings)
 
         # 3) Append to Excel workbook (one workbook per day, one sheet per soldier)
         book_name = f"vitals_{now.strftime('%Y-%m-%d')}.xlsx"
@@ -96,18 +144,17 @@ class Command(BaseCommand):
             .order_by("soldier_id")
         )
 
+        # open the workbook once, append every row, save once
+        wb, sheets = open_workbook(xlsx_path)
         for r in rows:
             sheet = f"{r.soldier.name}".strip()[:31]  # Excel sheet name limit
-            append_row_xlsx(
-                xlsx_path,
-                sheet,
-                header,
-                [
-                    r.ts.astimezone(timezone.get_current_timezone()).strftime("%Y-%m-%d %H:%M:%S"),
-                    r.soldier_id, r.soldier.name, r.soldier.device_id,
-                    r.hr, r.spo2, r.temp, r.bp_sys, r.bp_dia, r.battery, r.rssi
-                ]
-            )
+            get_sheet(wb, sheets, sheet, header).append([
+                r.ts.astimezone(timezone.get_current_timezone()).strftime("%Y-%m-%d %H:%M:%S"),
+                r.soldier_id, r.soldier.name, r.soldier.device_id,
+                r.hr, r.spo2, r.temp, r.bp_sys, r.bp_dia, r.battery, r.rssi
+            ])
+        if wb.worksheets:  # a new day with no rows has nothing to save
+            save_workbook_atomic(wb, xlsx_path)
 
         self.stdout.write(self.style.SUCCESS(
             f"Stored {created_count} reading(s), appended to {xlsx_path.name}"
@@ -1,11 +1,49 @@
+from itertools import chain
 from pathlib import Path
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.conf import settings
 
-import pandas as pd
+from openpyxl import load_workbook
 
 from telemetry.models import CurrentVital
+from telemetry.xlsx_utils import write_xlsx_fast
+
+
+COLUMNS = (
+    "date", "time", "ts_local", "organization", "person", "device_id",
+    "heart_rate", "spo2", "temp_c", "bp_sys", "bp_dia",
+    "battery_pct", "rssi", "lat", "lon",
+)
+
+# (device_id, ts_local) keys already written to each day's file, together
+# with the file's mtime when they were read. A different mtime means the
+# file changed underneath us, so its keys are read again.
+_seen: dict = {}
+
+
+def _seen_keys(excel_path: Path) -> set:
+    mtime = excel_path.stat().st_mtime_ns
+    cached = _seen.get(excel_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    keys = set()
+    try:
+        wb = load_workbook(excel_path, read_only=True)
+    except Exception:
+        wb = None
+    if wb is not None:
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = next(rows, ())
+            if "device_id" in header and "ts_local" in header:
+                di, ti = header.index("device_id"), header.index("ts_local")
+                keys = {(r[di], r[ti]) for r in rows}
+        finally:
+            wb.close()
+    _seen[excel_path] = (mtime, keys)
+    return keys
 
 
 def _snapshot_to_excel():
@@ -20,61 +58,65 @@ def _snapshot_to_excel():
 
     excel_path = out_dir / f"vitals_{local_now:%Y-%m-%d}.xlsx"
 
-    # Build new rows from CurrentVital (latest snapshot per device/person)
+    # Build new rows from CurrentVital (latest snapshot per device/person).
+    # values_list() yields plain tuples straight from the joined query, with
+    # no model instances or related-object caches in between.
+    tz = timezone.get_current_timezone()
     rows = []
-    cvs = CurrentVital.objects.select_related("device", "person", "device__organization")
-    for cv in cvs:
-        ts_local = timezone.localtime(cv.ts)
-        rows.append({
-            "date": ts_local.date().isoformat(),
-            "time": ts_local.strftime("%H:%M:%S"),
-            "ts_local": ts_local,  # keep a proper datetime for dedupe
-            "organization": cv.device.organization.name if cv.device and cv.device.organization_id else "",
-            "person": cv.person.name if cv.person_id else "",
-            "device_id": cv.device.device_id if cv.device_id else "",
-            "heart_rate": cv.heart_rate,
-            "spo2": cv.spo2,
-            "temp_c": cv.temp_c,
-            "bp_sys": cv.bp_sys,
-            "bp_dia": cv.bp_dia,
-            "battery_pct": cv.battery_pct,
-            "rssi": cv.rssi,
-            "lat": cv.lat,
-            "lon": cv.lon,
-        })
-
-    df_new = pd.DataFrame(rows)
-
-    # If nothing to write, still keep/return path
-    if df_new.empty:
-        if not excel_path.exists():
-            # write an empty-but-friendly sheet the first time
-            with pd.ExcelWriter(excel_path, engine="openpyxl") as w:
-                df_new.to_excel(w, index=False, sheet_name="vitals")
-        return str(excel_path), 0
+    cvs = CurrentVital.objects.values_list(
+        "ts", "device__organization__name", "person__name", "device__device_id",
+        "heart_rate", "spo2", "temp_c", "bp_sys", "bp_dia",
+        "battery_pct", "rssi", "lat", "lon",
+    )
+    for ts, org_name, person_name, device_id, *vitals in cvs:
+        # keep a proper datetime for dedupe (naive, whole seconds: Excel
+        # has no timezones and does not round-trip microseconds)
+        ts_local = ts.astimezone(tz).replace(tzinfo=None, microsecond=0)
+        rows.append((
+            ts_local.date().isoformat(),
+            ts_local.strftime("%H:%M:%S"),
+            ts_local,
+            org_name or "",
+            person_name or "",
+            device_id or "",
+            *vitals,
+        ))
 
-    # Merge with existing (to avoid duplicates of same device/timestamp)
-    if excel_path.exists():
-        try:
-            df_old = pd.read_excel(excel_path)
-        except Exception:
-            df_old = pd.DataFrame()
-        df_all = pd.concat([df_old, df_new], ignore_index=True)
-        # dedupe on (device_id, ts_local)
-        if "device_id" in df_all.columns and "ts_local" in df_all.columns:
-            df_all.drop_duplicates(subset=["device_id", "ts_local"], inplace=True, keep="last")
-    else:
-        df_all = df_new
-
-    # Write atomically
     tmp = excel_path.with_suffix(".tmp.xlsx")
-    with pd.ExcelWriter(tmp, engine="openpyxl", mode="w") as w:
-        df_all.to_excel(w, index=False, sheet_name="vitals")
+
+    if not excel_path.exists():
+        # First snapshot of the day (an empty-but-friendly sheet when there
+        # is nothing yet); rows go straight into the sheet XML.
+        write_xlsx_fast(tmp, COLUMNS, rows, sheet_name="vitals")
+        tmp.replace(excel_path)
+        _seen[excel_path] = (excel_path.stat().st_mtime_ns, {(r[5], r[2]) for r in rows})
+        return str(excel_path), len(rows)
+
+    # Append only rows not already in the file (dedupe on device_id, ts_local)
+    seen = _seen_keys(excel_path)
+    new_rows = []
+    new_keys = set()
+    for row in rows:
+        key = (row[5], row[2])
+        if key not in seen and key not in new_keys:
+            new_keys.add(key)
+            new_rows.append(row)
+    if not new_rows:
+        return str(excel_path), 0
+
+    # Rewrite atomically: stream the old rows through a read-only reader and
+    # the new ones after them, without loading the day into cell objects.
+    wb = load_workbook(excel_path, read_only=True)
+    try:
+        old_rows = wb.active.iter_rows(values_only=True)
+        header = next(old_rows, COLUMNS)
+        write_xlsx_fast(tmp, header, chain(old_rows, new_rows), sheet_name="vitals")
+    finally:
+        wb.close()
     tmp.replace(excel_path)
+    _seen[excel_path] = (excel_path.stat().st_mtime_ns, seen | new_keys)
 
-    # How many *new* rows got added this time?
-    added = len(df_new)
-    return str(excel_path), added
+    return str(excel_path), len(new_rows)
 
 
 class Command(BaseCommand):
@@ -0,0 +1,47 @@
+# telemetry/management/commands/freeze_settings.py
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Settings resolved through env fallback chains in core/settings.py
+# (gateway URLs + shared secret). Keep in sync with the block guarded by
+# `_frozen_gateways` there.
+FROZEN_SETTINGS = (
+    "VITALS_API_URL",
+    "VITALS_DEVICES_URL",
+    "GSM_INGEST_URL",
+    "VITALS_GSM_API_URL",
+    "VITALS_GSM_DEVICES_URL",
+    "VITALS_API_SECRET",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot the resolved gateway URLs/secret into core/settings_frozen.py "
+        "so production boots skip the env fallback chain."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--out",
+            type=str,
+            default=str(Path(settings.BASE_DIR) / "core" / "settings_frozen.py"),
+            help="Output module path (default: core/settings_frozen.py)",
+        )
+
+    def handle(self, *args, **opts):
+        out = Path(opts["out"])
+        lines = [
+            "# Generated by `manage.py freeze_settings`. Do not edit by hand;",
+            "# delete this file to go back to resolving these from the environment.",
+            "",
+        ]
+        for name in FROZEN_SETTINGS:
+            lines.append(f"{name} = {getattr(settings, name)!r}")
+
+        out.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(
+            f"Froze {len(FROZEN_SETTINGS)} setting(s) into {out}"
+        ))
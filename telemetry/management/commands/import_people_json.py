@@ -4,30 +4,49 @@ from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.utils import timezone
 
-from telemetry.models import Organization, Device, Person, Reading
+from telemetry.models import Organization, Device, Person, Reading, refresh_current_vitals
 
-def _combine_today(hhmm_or_label: str) -> datetime:
+def _combine_today(hhmm_or_label: str, today: date = None) -> datetime | None:
     """
-    Convert labels like '10:05' into a datetime today.
-    If label is already ISO-like, try parsing it directly.
+    Convert labels like '10:05' into an aware datetime today (current time
+    zone). If label is already ISO-like, try parsing it directly.
+    Anything else gives None: stamping it with now would give the same
+    reading a new ts on every run, and re-imports would duplicate it.
     """
-    today = date.today()
+    today = today or timezone.localdate()
     txt = str(hhmm_or_label).strip()
     # try HH:MM
     try:
         hh, mm = txt.split(":")[:2]
-        return datetime.combine(today, time(int(hh), int(mm)))
+        return timezone.make_aware(datetime.combine(today, time(int(hh), int(mm))))
     except Exception:
         pass
     # try ISO datetime
     for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S"):
         try:
-            return datetime.strptime(txt, fmt)
+            return timezone.make_aware(datetime.strptime(txt, fmt))
         except Exception:
             continue
-    # fallback: now
-    return datetime.now()
+    return None
+
+
+def _combine_today_many(labels, today: date = None) -> list:
+    """
+    _combine_today() over a whole series: today is looked up once and each
+    distinct label is parsed once (series labels repeat across people).
+    Unparseable labels come back as None.
+    """
+    today = today or timezone.localdate()
+    parsed = {}
+    out = []
+    for label in labels:
+        key = str(label)
+        if key not in parsed:
+            parsed[key] = _combine_today(key, today)
+        out.append(parsed[key])
+    return out
 
 class Command(BaseCommand):
     help = "Import people.json (mock) into Organization/Device/Person/Reading tables."
@@ -63,9 +82,14 @@ class Command(BaseCommand):
         if not people:
             raise CommandError("JSON has no 'people' array")
 
+        today = timezone.localdate()
+
         created_devices = 0
         created_people = 0
-        created_readings = 0
+        skipped_readings = 0
+        # Collected for one bulk insert at the end
+        all_readings = []
+        device_ids = set()
 
         for p in people:
             name = p.get("name", "Unknown")
@@ -96,6 +120,7 @@ class Command(BaseCommand):
             if person.device_id != device.id:
                 person.device = device
                 person.save(update_fields=["device"])
+            device_ids.add(device.id)
 
             series = p.get("series", {})
             labels = series.get("ts", [])
@@ -109,8 +134,12 @@ class Command(BaseCommand):
 
             # We’ll import N readings where N = len(labels)
             N = len(labels)
-            for i in range(N):
-                ts = _combine_today(labels[i])
+            stamps = _combine_today_many(labels, today)
+            skipped = 0
+            for i, ts in enumerate(stamps):
+                if ts is None:
+                    skipped += 1
+                    continue
 
                 r = Reading(
                     device=device,
@@ -129,21 +158,39 @@ class Command(BaseCommand):
                     r.lat = path[i].get("lat")
                     r.lon = path[i].get("lon")
 
-                r.save()
-                created_readings += 1
+                all_readings.append(r)
 
             # If there were path points beyond series length, insert location-only rows
             if len(path) > N:
-                for j in range(N, len(path)):
-                    ts = _combine_today(path[j].get("ts", datetime.now().strftime("%H:%M")))
-                    Reading.objects.create(
+                extra = _combine_today_many(
+                    (pt.get("ts", "") for pt in path[N:]), today
+                )
+                for j, ts in zip(range(N, len(path)), extra):
+                    if ts is None:
+                        skipped += 1
+                        continue
+                    all_readings.append(Reading(
                         device=device, ts=ts,
                         lat=path[j].get("lat"), lon=path[j].get("lon"),
                         battery_pct=latest.get("battery"),
                         rssi=latest.get("rssi"),
-                    )
-                    created_readings += 1
+                    ))
+
+            if skipped:
+                skipped_readings += skipped
+                self.stdout.write(self.style.WARNING(
+                    f"Skipping {skipped} reading(s) of {name}: missing or unparseable ts"
+                ))
+
+        # bulk_create skips the post_save signal, so CurrentVital is
+        # refreshed once per device afterwards. Readings already stored for
+        # the same (device, ts) are skipped, so the count is taken from the
+        # table rather than from the list submitted.
+        before = Reading.objects.count()
+        Reading.objects.bulk_create(all_readings, batch_size=1000, ignore_conflicts=True)
+        refresh_current_vitals(device_ids)
+        created_readings = Reading.objects.count() - before
 
         self.stdout.write(self.style.SUCCESS(
-            f"Imported into org '{org_name}': devices={created_devices}, people={created_people}, readings={created_readings}"
+            f"Imported into org '{org_name}': devices={created_devices}, people={created_people}, readings={created_readings}, skipped={skipped_readings}"
         ))
@@ -1,7 +1,8 @@
 # telemetry/management/commands/seed_demo_readings.py
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
-from telemetry.models import Organization, Device, Person, Reading
+from telemetry.models import Organization, Device, Person, Reading, refresh_current_vitals
 import random
 
 class Command(BaseCommand):
@@ -11,6 +12,8 @@ class Command(BaseCommand):
         parser.add_argument("--count", type=int, default=24,
                             help="How many points per device (5-min spacing).")
 
+    # One transaction (one commit/fsync) for the devices, people and readings
+    @transaction.atomic
     def handle(self, *args, **opts):
         org, _ = Organization.objects.get_or_create(name="Demo Org")
 
@@ -36,21 +39,33 @@ class Command(BaseCommand):
         per = int(opts["count"])
         now = timezone.now()
 
-        for dev in devices:
-            for k in range(per):
-                ts = now - timezone.timedelta(minutes=5 * (per - k))
-                Reading.objects.create(
-                    device=dev,
-                    ts=ts,
-                    heart_rate=78 + (k % 12),
-                    spo2=96 - (k % 4),
-                    temp_c=36.5 + (k % 5) * 0.1,
-                    bp_sys=112 + (k % 10),
-                    bp_dia=74 + (k % 7),
-                    lat=28.6139 + random.uniform(-0.005, 0.005),  # Delhi-ish
-                    lon=77.2090 + random.uniform(-0.005, 0.005),
-                    battery_pct=100 - (k % 30),
-                    rssi=-90 + (k % 12),
-                )
+        # All jittered coordinates (Delhi-ish, +/-0.005 deg) drawn in one pass
+        rand = random.random
+        coords = [
+            (28.6139 + (rand() - 0.5) * 0.01, 77.2090 + (rand() - 0.5) * 0.01)
+            for _ in range(len(devices) * per)
+        ]
+
+        # One batched insert; bulk_create skips post_save, so CurrentVital
+        # is refreshed once for the seeded devices afterwards.
+        readings = (
+            Reading(
+                device=dev,
+                ts=now - timezone.timedelta(minutes=5 * (per - k)),
+                heart_rate=78 + (k % 12),
+                spo2=96 - (k % 4),
+                temp_c=36.5 + (k % 5) * 0.1,
+                bp_sys=112 + (k % 10),
+                bp_dia=74 + (k % 7),
+                lat=coords[d * per + k][0],
+                lon=coords[d * per + k][1],
+                battery_pct=100 - (k % 30),
+                rssi=-90 + (k % 12),
+            )
+            for d, dev in enumerate(devices)
+            for k in range(per)
+        )
+        Reading.objects.bulk_create(readings, batch_size=1000, ignore_conflicts=True)
+        refresh_current_vitals([dev.id for dev in devices])
 
         self.stdout.write(self.style.SUCCESS("Inserted demo readings."))
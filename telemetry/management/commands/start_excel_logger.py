@@ -1,6 +1,8 @@
 # telemetry/management/commands/start_excel_logger.py
 import os
 import re
+import signal
+import sys
 import time
 from datetime import datetime
 from pathlib import Path
@@ -20,9 +22,10 @@ def safe_name(s: str) -> str:
     s = re.sub(r"[^\w\-]+", "_", s.strip())
     return s or "unknown"
 
-def ensure_sheet_with_headers(xlsx_path: Path):
+def open_workbook(xlsx_path: Path):
     """
-    Create a workbook with a single 'data' sheet with headers if file does not exist.
+    Load an existing workbook, or start a new one with a single 'data' sheet
+    with headers (written to disk on the next flush).
     Return (workbook, worksheet).
     """
     if xlsx_path.exists():
@@ -41,8 +44,7 @@ def ensure_sheet_with_headers(xlsx_path: Path):
         "battery_pct", "rssi",
         "ts_iso"
     ])
-    wb.save(xlsx_path)
-    return wb, wb.active
+    return wb, ws
 
 def row_from_cv(p: Person, cv: CurrentVital):
     local_ts = timezone.localtime(cv.ts)
@@ -85,52 +87,77 @@ class Command(BaseCommand):
         # Keep the latest timestamp written for each device to avoid duplicates
         last_written_ts = {}
 
+        # Open workbooks stay in memory across ticks (path -> (wb, ws)); only
+        # the ones touched in a tick are saved, once, at the end of it.
+        books = {}
+        dirty = set()
+
+        def flush():
+            for path in list(dirty):
+                try:
+                    books[path][0].save(path)
+                    dirty.discard(path)
+                except Exception as e:
+                    self.stderr.write(self.style.ERROR(f"Error saving {path}: {e}"))
+
+        # Turn SIGTERM into SystemExit so the finally below flushes pending rows
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
         self.stdout.write(self.style.SUCCESS(
             f"Excel logger started. Interval={interval}s, output={base_out}"
         ))
         self.stdout.write("Press Ctrl+C to stop.\n")
 
-        while True:
-            try:
-                # Pull all persons that have a device and a current vital row
-                persons = (
-                    Person.objects.select_related("device")
-                    .filter(device__isnull=False)
-                    .order_by("id")
-                )
-
-                for p in persons:
-                    dev = p.device
-                    # There might not yet be a CurrentVital row
-                    try:
-                        cv = dev.current
-                    except CurrentVital.DoesNotExist:
-                        continue
-                    if not cv or not cv.ts:
-                        continue
-
-                    # Skip if we already wrote this timestamp for the device
-                    last_ts = last_written_ts.get(dev.id)
-                    if last_ts is not None and cv.ts <= last_ts:
-                        continue
-
-                    # Compute output path: exports/vitals/YYYY-MM-DD/Person_Name.xlsx
-                    day = timezone.localtime(cv.ts).strftime("%Y-%m-%d")
-                    out_dir = base_out / day
-                    xlsx_path = out_dir / f"{safe_name(p.name)}.xlsx"
-
-                    # Ensure workbook & headers, then append one row
-                    wb, ws = ensure_sheet_with_headers(xlsx_path)
-                    ws.append(row_from_cv(p, cv))
-                    wb.save(xlsx_path)
-
-                    last_written_ts[dev.id] = cv.ts
-                    self.stdout.write(
-                        f"✔ wrote {p.name} @ {timezone.localtime(cv.ts).strftime('%H:%M:%S')} -> {xlsx_path}"
+        try:
+            while True:
+                try:
+                    # Pull all persons that have a device and a current vital row,
+                    # joined in one query so dev.current needs no extra lookup,
+                    # and streamed in chunks rather than cached as a whole list
+                    persons = (
+                        Person.objects.select_related("device", "device__current")
+                        .filter(device__isnull=False, device__current__isnull=False)
+                        .order_by("id")
+                        .iterator(chunk_size=200)
                     )
 
-            except Exception as e:
-                # Don't crash the loop if one write fails.
-                self.stderr.write(self.style.ERROR(f"Error: {e}"))
-
-            time.sleep(interval)
+                    for p in persons:
+                        dev = p.device
+                        cv = dev.current
+                        if not cv.ts:
+                            continue
+
+                        # Skip if we already wrote this timestamp for the device
+                        last_ts = last_written_ts.get(dev.id)
+                        if last_ts is not None and cv.ts <= last_ts:
+                            continue
+
+                        # Compute output path: exports/vitals/YYYY-MM-DD/Person_Name.xlsx
+                        day = timezone.localtime(cv.ts).strftime("%Y-%m-%d")
+                        out_dir = base_out / day
+                        xlsx_path = out_dir / f"{safe_name(p.name)}.xlsx"
+
+                        # Ensure workbook & headers, then append one row
+                        if xlsx_path not in books:
+                            books[xlsx_path] = open_workbook(xlsx_path)
+                        books[xlsx_path][1].append(row_from_cv(p, cv))
+                        dirty.add(xlsx_path)
+
+                        last_written_ts[dev.id] = cv.ts
+                        self.stdout.write(
+                            f"✔ wrote {p.name} @ {timezone.localtime(cv.ts).strftime('%H:%M:%S')} -> {xlsx_path}"
+                        )
+
+                except Exception as e:
+                    # Don't crash the loop if one write fails.
+                    self.stderr.write(self.style.ERROR(f"Error: {e}"))
+
+                flush()
+                # Drop workbooks of previous days once they are on disk
+                today = timezone.localtime().strftime("%Y-%m-%d")
+                for path in [p for p in books if p.parent.name < today and p not in dirty]:
+                    del books[path]
+
+                time.sleep(interval)
+        finally:
+            flush()
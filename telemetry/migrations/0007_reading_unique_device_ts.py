@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-15 08:34
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_readings(apps, schema_editor):
+    # Keep the newest row (highest id) of each (device, ts) pair so the
+    # unique constraint can be created.
+    Reading = apps.get_model('telemetry', 'Reading')
+    keep = (
+        Reading.objects.values('device_id', 'ts')
+        .annotate(keep_id=Max('id'))
+        .values('keep_id')
+    )
+    Reading.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetry', '0006_remove_currentvital_hops_remove_currentvital_path_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reading',
+            name='ts',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(drop_duplicate_readings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reading',
+            constraint=models.UniqueConstraint(fields=('device', 'ts'), name='uniq_reading_device_ts'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
+from django.db.models import OuterRef, Subquery
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 
 class Organization(models.Model):
@@ -44,7 +46,8 @@ class Person(models.Model):
 
 class Reading(models.Model):
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name="readings")
-    ts = models.DateTimeField(auto_now_add=True)
+    # default (not auto_now_add) so importers can store the reading's own time
+    ts = models.DateTimeField(default=timezone.now)
 
     heart_rate = models.IntegerField(null=True, blank=True)
     bp_sys = models.IntegerField(null=True, blank=True)
@@ -60,6 +63,9 @@ class Reading(models.Model):
 
     class Meta:
         indexes = [models.Index(fields=["device", "-ts"])]
+        constraints = [
+            models.UniqueConstraint(fields=["device", "ts"], name="uniq_reading_device_ts"),
+        ]
 
     def __str__(self):
         return f"{self.device.device_id} @ {self.ts:%Y-%m-%d %H:%M:%S}"
@@ -99,30 +105,71 @@ class CurrentVital(models.Model):
         return f"Current {self.device.device_id} @ {self.ts:%H:%M:%S}"
 
 
+# Reading fields mirrored onto CurrentVital
+CURRENT_VITAL_FIELDS = (
+    "heart_rate", "bp_sys", "bp_dia", "spo2", "temp_c",
+    "lat", "lon", "battery_pct", "rssi",
+)
+
+
+def refresh_current_vitals(device_ids):
+    """
+    Rebuild CurrentVital from the newest Reading of each device in one upsert.
+    bulk_create() skips post_save, so bulk importers call this afterwards.
+    """
+    newest = (
+        Reading.objects.filter(device=OuterRef("device"))
+        .order_by("-ts", "-id")
+        .values("id")[:1]
+    )
+    latest = (
+        Reading.objects.filter(device_id__in=device_ids, id=Subquery(newest))
+        .select_related("device__person")
+    )
+    rows = [
+        CurrentVital(
+            device_id=r.device_id,
+            person=getattr(r.device, "person", None),
+            ts=r.ts,
+            **{f: getattr(r, f) for f in CURRENT_VITAL_FIELDS},
+        )
+        for r in latest
+    ]
+    CurrentVital.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["device"],
+        update_fields=["person", "ts", *CURRENT_VITAL_FIELDS, "updated_at"],
+    )
+    return len(rows)
+
+
 # --- Keep CurrentVital fresh whenever a Reading is saved ---
 @receiver(post_save, sender=Reading)
 def update_current_vital(sender, instance: Reading, created, **kwargs):
-    dev = instance.device
+    values = {f: getattr(instance, f) for f in CURRENT_VITAL_FIELDS}
     # link the person if you have Person.device set
-    person = getattr(dev, "person", None)
-
-    try:
-        cv = CurrentVital.objects.get(device=dev)
-        # only replace if this reading is newer
-        if instance.ts <= cv.ts:
-            return
-    except CurrentVital.DoesNotExist:
-        cv = CurrentVital(device=dev)
-
-    cv.person = person
-    cv.ts = instance.ts
-    cv.heart_rate = instance.heart_rate
-    cv.bp_sys = instance.bp_sys
-    cv.bp_dia = instance.bp_dia
-    cv.spo2 = instance.spo2
-    cv.temp_c = instance.temp_c
-    cv.lat = instance.lat
-    cv.lon = instance.lon
-    cv.battery_pct = instance.battery_pct
-    cv.rssi = instance.rssi
-    cv.save()
+    person_id = Subquery(
+        Person.objects.filter(device_id=instance.device_id).values("id")[:1]
+    )
+
+    # Common case, one statement: the row exists and this reading is newer.
+    # update() skips auto_now, so updated_at is set here.
+    updated = CurrentVital.objects.filter(
+        device_id=instance.device_id, ts__lt=instance.ts
+    ).update(person_id=person_id, ts=instance.ts, updated_at=timezone.now(), **values)
+    if updated:
+        return
+
+    # No row yet, or the stored one is as new or newer: insert, and let the
+    # unique device key turn the second case into a no-op.
+    CurrentVital.objects.bulk_create(
+        [CurrentVital(
+            device_id=instance.device_id,
+            person_id=Person.objects.filter(device_id=instance.device_id)
+            .values_list("id", flat=True).first(),
+            ts=instance.ts,
+            **values,
+        )],
+        ignore_conflicts=True,
+    )
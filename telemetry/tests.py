@@ -1,3 +1,667 @@
-from django.test import TestCase
+import importlib.util
+import logging
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import orjson
+import requests
+from openpyxl import load_workbook
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.log_handlers import QueueConsoleHandler
+
+from . import views
+from .duckdb_utils import get_duckdb_conn, get_duckdb_path
+from .management.commands.freeze_settings import FROZEN_SETTINGS
+from .models import CurrentVital, Device, Organization, Reading, refresh_current_vitals
+from .xlsx_utils import write_xlsx_fast
+
+
+class WriteXlsxFastTests(TestCase):
+    def test_mixed_types_round_trip_through_openpyxl(self):
+        when = datetime(2026, 1, 2, 3, 4, 5)
+        header = ["none", "bool", "int", "float", "nan", "datetime", "date", "str"]
+        rows = [
+            [None, True, 42, 1.5, float("nan"), when, date(2026, 1, 2), "a<b & \"c\""],
+            ["", False, -7, float("inf"), float("-inf"), when, date(1999, 12, 31), "ctl\x00\x08\x0b\x0c\x1fok\ttab"],
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.xlsx")
+            self.assertEqual(write_xlsx_fast(path, header, rows, sheet_name="Vitals"), 2)
+            wb = load_workbook(path)
+            ws = wb["Vitals"]
+            got = [list(r) for r in ws.iter_rows(values_only=True)]
+            wb.close()
+
+        self.assertEqual(got[0], header)
+        self.assertEqual(got[1], [
+            None, True, 42, 1.5, None, when, datetime(2026, 1, 2), "a<b & \"c\"",
+        ])
+        self.assertEqual(got[2], [
+            None, False, -7, None, None, when, datetime(1999, 12, 31), "ctlok\ttab",
+        ])
+
+
+class ReadingUniqueConstraintTests(TestCase):
+    def setUp(self):
+        org = Organization.objects.create(name="Org")
+        self.device = Device.objects.create(organization=org, device_id="dev-1")
+        self.ts = datetime(2026, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+    def test_duplicate_insert_raises(self):
+        Reading.objects.create(device=self.device, ts=self.ts, heart_rate=70)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Reading.objects.create(device=self.device, ts=self.ts, heart_rate=71)
+
+    def test_bulk_create_ignore_conflicts_skips_duplicates(self):
+        Reading.objects.create(device=self.device, ts=self.ts, heart_rate=70)
+        Reading.objects.bulk_create(
+            [
+                Reading(device=self.device, ts=self.ts, heart_rate=71),
+                Reading(device=self.device, ts=self.ts.replace(minute=1), heart_rate=72),
+            ],
+            ignore_conflicts=True,
+        )
+        self.assertEqual(Reading.objects.count(), 2)
+        self.assertEqual(Reading.objects.get(ts=self.ts).heart_rate, 70)
+
+
+class CurrentVitalSignalTests(TestCase):
+    def setUp(self):
+        org = Organization.objects.create(name="Org")
+        self.device = Device.objects.create(organization=org, device_id="dev-1")
+        self.ts = datetime(2026, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+    def test_first_reading_creates_row(self):
+        Reading.objects.create(device=self.device, ts=self.ts, heart_rate=70, spo2=98)
+        cv = CurrentVital.objects.get(device=self.device)
+        self.assertEqual((cv.ts, cv.heart_rate, cv.spo2), (self.ts, 70, 98))
+
+    def test_newer_reading_overwrites(self):
+        Reading.objects.create(device=self.device, ts=self.ts, heart_rate=70)
+        Reading.objects.create(device=self.device, ts=self.ts.replace(minute=5), heart_rate=80)
+        cv = CurrentVital.objects.get(device=self.device)
+        self.assertEqual((cv.ts, cv.heart_rate), (self.ts.replace(minute=5), 80))
+
+    def test_older_reading_does_not_overwrite(self):
+        Reading.objects.create(device=self.device, ts=self.ts.replace(minute=5), heart_rate=80)
+        Reading.objects.create(device=self.device, ts=self.ts, heart_rate=70)
+        self.assertEqual(CurrentVital.objects.count(), 1)
+        cv = CurrentVital.objects.get(device=self.device)
+        self.assertEqual((cv.ts, cv.heart_rate), (self.ts.replace(minute=5), 80))
+
+    def test_refresh_matches_latest_reading(self):
+        other = Device.objects.create(organization=self.device.organization, device_id="dev-2")
+        # bulk_create skips post_save, like the importers
+        Reading.objects.bulk_create([
+            Reading(device=self.device, ts=self.ts.replace(minute=m), heart_rate=60 + m)
+            for m in (3, 9, 1)
+        ] + [Reading(device=other, ts=self.ts, heart_rate=55)])
+        self.assertFalse(CurrentVital.objects.exists())
+
+        self.assertEqual(refresh_current_vitals([self.device.id, other.id]), 2)
+        for dev in (self.device, other):
+            latest = Reading.objects.filter(device=dev).latest("ts")
+            cv = CurrentVital.objects.get(device=dev)
+            self.assertEqual((cv.ts, cv.heart_rate), (latest.ts, latest.heart_rate))
+
+
+class DropDuplicateReadingsMigrationTests(TransactionTestCase):
+    migrate_from = [("telemetry", "0006_remove_currentvital_hops_remove_currentvital_path_and_more")]
+    migrate_to = [("telemetry", "0007_reading_unique_device_ts")]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        OldOrganization = apps.get_model("telemetry", "Organization")
+        OldDevice = apps.get_model("telemetry", "Device")
+        OldReading = apps.get_model("telemetry", "Reading")
+
+        org = OldOrganization.objects.create(name="Org")
+        dev = OldDevice.objects.create(organization=org, device_id="dev-1")
+        ids = [OldReading.objects.create(device=dev, heart_rate=hr).id for hr in (70, 71, 72, 73)]
+        # ts is auto_now_add before 0007, so collide the timestamps by hand
+        ts = datetime(2026, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+        OldReading.objects.filter(id__in=ids[:3]).update(ts=ts)
+        OldReading.objects.filter(id=ids[3]).update(ts=ts.replace(minute=1))
+        self.ids = ids
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_collapse_to_newest_id(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        OldReading = apps.get_model("telemetry", "Reading")
+        self.assertEqual(
+            sorted(OldReading.objects.values_list("id", flat=True)),
+            [self.ids[2], self.ids[3]],
+        )
+
+
+class _FakeResponse:
+    """Just enough of a stream=True requests.Response for _fetch_rows."""
+
+    def __init__(self, payload, status_code=200, url="http://gw.test/"):
+        self._body = orjson.dumps(payload)
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.url = url
+        self.headers = {"Content-Length": str(len(self._body))}
+
+    def iter_content(self, chunk_size):
+        yield self._body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+GATEWAY_ROWS = {"items": [{
+    "device_id": "dev-1", "label": "Alice", "lat": 1.5, "lon": 2.5,
+    "ts": "2026-01-01T12:00:00Z",
+}]}
+
+
+class GatewayRowsCacheTests(TestCase):
+    url = "http://gw.test/devices"
+
+    def setUp(self):
+        cache.clear()
+        views._INFLIGHT.clear()
+        patcher = mock.patch.object(views._SESSION, "get")
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(views._INFLIGHT.clear)
+
+    def fetch(self):
+        return views._fetch_rows_cached("test", self.url, {}, 5)
+
+    def test_fresh_copy_answers_without_upstream(self):
+        self.get.return_value = _FakeResponse(GATEWAY_ROWS)
+        first = self.fetch()
+        views._INFLIGHT.clear()  # rule out the single-flight window
+        second = self.fetch()
+        self.assertEqual(first, (GATEWAY_ROWS["items"], False))
+        self.assertEqual(second, first)
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_stale_copy_served_when_upstream_fails(self):
+        self.get.return_value = _FakeResponse(GATEWAY_ROWS)
+        self.fetch()
+        cache.delete(views._rows_cache_keys(self.url, None)[0])  # fresh copy expired
+        views._INFLIGHT.clear()
+        self.get.side_effect = requests.ConnectionError("down")
+        with self.assertLogs("telemetry.views", "WARNING"):
+            self.assertEqual(self.fetch(), (GATEWAY_ROWS["items"], True))
+        self.assertEqual(self.get.call_count, 2)
+
+    def test_failure_without_copy_is_empty(self):
+        self.get.return_value = _FakeResponse({"error": "boom"}, status_code=502)
+        with self.assertLogs("telemetry.views", "WARNING"):
+            self.assertEqual(self.fetch(), ([], False))
+
+    def test_concurrent_requests_share_one_upstream_call(self):
+        def slow_get(*args, **kwargs):
+            time.sleep(0.2)
+            return _FakeResponse(GATEWAY_ROWS)
+
+        self.get.side_effect = slow_get
+        start = threading.Barrier(5)
+        results = []
+
+        def worker():
+            start.wait()
+            results.append(views._fetch_rows_coalesced("test", self.url, {}, 5))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [GATEWAY_ROWS["items"]] * 5)
+        self.assertEqual(self.get.call_count, 1)
+
+
+@override_settings(
+    VITALS_DEVICES_URL="http://gw.test/devices",
+    VITALS_API_URL="",
+    VITALS_GSM_DEVICES_URL="",
+    VITALS_GSM_API_URL="",
+)
+class CurrentRecentStaleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        views._INFLIGHT.clear()
+        views._RECENT_CACHE.clear()
+        patcher = mock.patch.object(views._SESSION, "get")
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(views._INFLIGHT.clear)
+        self.client.force_login(User.objects.create_user("u", password="p"))
+
+    def items(self, response):
+        return orjson.loads(b"".join(response.streaming_content))["items"]
+
+    def test_stale_rows_flagged_with_x_cache(self):
+        self.get.return_value = _FakeResponse(GATEWAY_ROWS)
+        r = self.client.get("/api/current/recent/")
+        self.assertEqual(r.status_code, 200)
+        self.assertNotIn("X-Cache", r.headers)
+        fresh_items = self.items(r)
+
+        cache.delete(views._rows_cache_keys("http://gw.test/devices", None)[0])
+        views._INFLIGHT.clear()
+        self.get.side_effect = requests.ConnectionError("down")
+        with self.assertLogs("telemetry.views", "WARNING"):
+            r = self.client.get("/api/current/recent/")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.headers["X-Cache"], "STALE")
+        self.assertEqual(self.items(r), fresh_items)
+        self.assertEqual([it["device_id"] for it in fresh_items], ["dev-1"])
+
+
+def _old_to_float(v):
+    # the helper as it was before its isinstance fast path
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _old_parse_date(raw):
+    # the strptime loop the tracking views used before _parse_date
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(raw, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _old_parse_ts_iso(s):
+    # views._parse_ts_iso before _parse_iso_cached replaced it
+    if not s:
+        return None
+    try:
+        return datetime.fromisoformat(str(s).replace("Z", "+00:00")).astimezone(dt_timezone.utc)
+    except Exception:
+        return None
+
+
+def _old_parse_ts_any(ts_raw):
+    # epoch numbers and digit strings, else fromisoformat, as before the
+    # memoized fast paths
+    if ts_raw is None or ts_raw == "":
+        return None
+    if isinstance(ts_raw, (int, float)):
+        try:
+            return datetime.fromtimestamp(float(ts_raw), tz=dt_timezone.utc)
+        except Exception:
+            return None
+    s = str(ts_raw).strip()
+    if s.isdigit():
+        try:
+            return datetime.fromtimestamp(float(s), tz=dt_timezone.utc)
+        except Exception:
+            pass
+    return _old_parse_ts_iso(s)
+
+
+class ValueParserTests(TestCase):
+    def test_to_float_matches_float(self):
+        cases = [
+            None, 0, 7, -3, 2.5, True, False, "1.5", " 42 ", "-0.25", "1e3",
+            "", "abc", "1,5", "nan", "inf", [], {}, b"3",
+        ]
+        for raw in cases:
+            with self.subTest(raw=raw):
+                got, want = views._to_float(raw), _old_to_float(raw)
+                if isinstance(want, float) and math.isnan(want):
+                    self.assertTrue(math.isnan(got))
+                else:
+                    self.assertEqual(got, want)
+                    self.assertIs(type(got), type(want))
+
+    def test_parse_date_matches_strptime(self):
+        cases = [
+            ("2026-01-02", date(2026, 1, 2)),
+            ("02-01-2026", date(2026, 1, 2)),
+            ("2024-02-29", date(2024, 2, 29)),
+            ("2026-5-1", date(2026, 5, 1)),
+            ("1-5-2026", date(2026, 5, 1)),
+            ("2023-02-29", None),
+            ("2026-13-01", None),
+            ("31-04-2026", None),
+            ("2026/01/02", None),
+            ("2026-01-02 ", None),
+            ("20260102", None),
+            ("abcd-ef-gh", None),
+            ("", None),
+        ]
+        for raw, expected in cases:
+            with self.subTest(raw=raw):
+                self.assertEqual(views._parse_date(raw), expected)
+                self.assertEqual(views._parse_date(raw), _old_parse_date(raw))
+
+    def test_parse_ts_any_matches_old_parsing(self):
+        utc = dt_timezone.utc
+        noon = datetime(2026, 1, 1, 12, 0, tzinfo=utc)
+        epoch = datetime(2023, 11, 14, 22, 13, 20, tzinfo=utc)
+        cases = [
+            ("2026-01-01T12:00:00Z", noon),
+            ("2026-01-01T12:00:00+00:00", noon),
+            ("2026-01-01T14:00:00+02:00", noon),
+            ("2026-01-01T06:30:00.250000-05:30", noon + timedelta(milliseconds=250)),
+            (" 2026-01-01T12:00:00Z ", noon),
+            ("2026-01-01T12:00:00", ...),  # naive: local time, as before
+            ("2026-01-01", ...),
+            (datetime(2026, 1, 1, 14, 0, tzinfo=dt_timezone(timedelta(hours=2))), noon),
+            (noon, noon),
+            (1700000000, epoch),
+            (1700000000.5, epoch + timedelta(milliseconds=500)),
+            ("1700000000", epoch),
+            (" 1700000000 ", epoch),
+            (1700000000000, None),  # epoch ms is out of range, as before
+            ("1700000000000", None),
+            ("1700000000.5", None),
+            ("-5", None),
+            ("1e9", None),
+            ("nan", None),
+            (float("nan"), None),
+            ("", None),
+            ("   ", None),
+            (None, None),
+            ("garbage", None),
+            ("2026-13-01T00:00:00Z", None),
+        ]
+        for raw, expected in cases:
+            with self.subTest(raw=raw):
+                got = views._parse_ts_any(raw)
+                self.assertEqual(got, _old_parse_ts_any(raw))
+                if expected is not ...:
+                    self.assertEqual(got, expected)
+                if got is not None:
+                    self.assertEqual(got.utcoffset(), timedelta(0))
+
+
+class ConditionalGetTests(TestCase):
+    """200 with an ETag, 304 with an empty body on revalidation, 200 on change."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("u", password="p"))
+
+    def assertRevalidates(self, url, change):
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        etag = r.headers["ETag"]
+        r.close()
+
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.content, b"")
+        self.assertEqual(r.headers["ETag"], etag)
+
+        change()
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r.headers["ETag"], etag)
+        r.close()
+
+    def test_download_latest_workbook(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        views._LATEST_WORKBOOK = None
+        self.addCleanup(setattr, views, "_LATEST_WORKBOOK", None)
+        path = os.path.join(tmp.name, "vitals_2026-01-01.xlsx")
+        with open(path, "wb") as f:
+            f.write(b"first")
+        os.utime(path, (1_700_000_000, 1_700_000_000))
+
+        def rewrite():
+            with open(path, "wb") as f:
+                f.write(b"second version")
+            os.utime(path, (1_700_000_100, 1_700_000_100))
+
+        with override_settings(EXCEL_DIR=tmp.name, EXCEL_XACCEL_PREFIX=""):
+            r = self.client.get("/download/latest.xlsx")
+            self.assertEqual(b"".join(r.streaming_content), b"first")
+            self.assertIn("Last-Modified", r.headers)
+            r.close()
+            self.assertRevalidates("/download/latest.xlsx", rewrite)
+
+    @override_settings(
+        VITALS_DEVICES_URL="http://gw.test/devices",
+        VITALS_API_URL="",
+        VITALS_GSM_DEVICES_URL="",
+        VITALS_GSM_API_URL="",
+    )
+    def test_api_current_recent(self):
+        cache.clear()
+        views._INFLIGHT.clear()
+        views._RECENT_CACHE.clear()
+        self.addCleanup(views._INFLIGHT.clear)
+        patcher = mock.patch.object(views._SESSION, "get", return_value=_FakeResponse(GATEWAY_ROWS))
+        get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        def move_device():
+            cache.clear()
+            views._INFLIGHT.clear()
+            moved = {"items": [dict(GATEWAY_ROWS["items"][0], lat=1.6)]}
+            get.return_value = _FakeResponse(moved)
+
+        self.assertRevalidates("/api/current/recent/", move_device)
+
+    @override_settings(
+        VITALS_DEVICES_URL="http://gw.test/devices",
+        VITALS_API_URL="",
+        VITALS_GSM_DEVICES_URL="",
+        VITALS_GSM_API_URL="",
+    )
+    def test_api_current_recent_parses_if_none_match(self):
+        cache.clear()
+        views._INFLIGHT.clear()
+        views._RECENT_CACHE.clear()
+        self.addCleanup(views._INFLIGHT.clear)
+        patcher = mock.patch.object(views._SESSION, "get", return_value=_FakeResponse(GATEWAY_ROWS))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        r = self.client.get("/api/current/recent/")
+        etag = r.headers["ETag"]
+        r.close()
+        strong = etag.removeprefix("W/")
+        for header in ('"other", ' + etag, strong, "*"):
+            with self.subTest(header=header):
+                r = self.client.get("/api/current/recent/", HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(r.status_code, 304)
+        r = self.client.get("/api/current/recent/", HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(r.status_code, 200)
+        r.close()
+
+    @override_settings(
+        VITALS_DEVICES_URL="http://gw.test/devices",
+        VITALS_API_URL="",
+        VITALS_GSM_DEVICES_URL="",
+        VITALS_GSM_API_URL="",
+    )
+    def test_api_current_recent_vitals_under_same_ts(self):
+        cache.clear()
+        views._INFLIGHT.clear()
+        views._RECENT_CACHE.clear()
+        self.addCleanup(views._INFLIGHT.clear)
+        row = dict(GATEWAY_ROWS["items"][0], hr=70, spo2=97)
+        patcher = mock.patch.object(views._SESSION, "get", return_value=_FakeResponse({"items": [row]}))
+        get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        def correct_vitals():
+            cache.clear()
+            views._INFLIGHT.clear()
+            get.return_value = _FakeResponse({"items": [dict(row, hr=72)]})
+
+        self.assertRevalidates("/api/current/recent/", correct_vitals)
+
+    def test_api_tracking(self):
+        payload = {"trips": [], "total_km": 0.0}
+        patcher = mock.patch.object(views, "_compute_trip_payload", return_value=payload)
+        compute = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        def new_trip():
+            compute.return_value = {"trips": [{"km": 1.0}], "total_km": 1.0}
+
+        self.assertRevalidates("/api/tracking/?device_id=dev-1&date=2026-01-01", new_trip)
+
+
+class FreezeSettingsCommandTests(TestCase):
+    @override_settings(
+        VITALS_API_URL="https://gw.example/vitals",
+        VITALS_DEVICES_URL="https://gw.example/vitals/devices",
+        GSM_INGEST_URL="",
+        VITALS_GSM_API_URL=None,
+        VITALS_GSM_DEVICES_URL="https://gw.example/vitals_gsm/devices",
+        VITALS_API_SECRET="s3cr'et\\\"x",
+    )
+    def test_generated_module_reproduces_settings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "settings_frozen.py")
+            call_command("freeze_settings", out=out, stdout=StringIO())
+            spec = importlib.util.spec_from_file_location("settings_frozen_test", out)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+
+        frozen = {k: v for k, v in vars(module).items() if not k.startswith("__")}
+        self.assertEqual(frozen, {name: getattr(settings, name) for name in FROZEN_SETTINGS})
+
+
+class DuckDBConnectionTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "vitals.duckdb")
+        override = override_settings(DUCKDB_PATH=self.path, DUCKDB_SHARED_CONNECTION=False)
+        override.enable()
+        self.addCleanup(override.disable)
+        get_duckdb_path.cache_clear()
+        self.addCleanup(get_duckdb_path.cache_clear)
+
+    def test_file_is_unlocked_between_requests(self):
+        import duckdb
+
+        duckdb.connect(self.path).close()
+        with get_duckdb_conn() as con:
+            self.assertEqual(con.execute("SELECT 1").fetchall(), [(1,)])
+        # another process, like the sync job, can now open it to write
+        writer = subprocess.run(
+            [sys.executable, "-c",
+             "import duckdb, sys; duckdb.connect(sys.argv[1]).execute('CREATE TABLE t (x INT)')",
+             self.path],
+            capture_output=True, text=True,
+        )
+        self.assertEqual(writer.returncode, 0, writer.stderr)
+
+    def test_read_only_open_creates_missing_file(self):
+        self.assertFalse(os.path.exists(self.path))
+        with get_duckdb_conn() as con:
+            self.assertEqual(con.execute("SELECT 1").fetchall(), [(1,)])
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_tracking_reads_on_missing_file_fall_back_cleanly(self):
+        with self.assertNoLogs("telemetry.views", "ERROR"):
+            payload = views._compute_trip_payload("dev-1", date(2026, 1, 1))
+        self.assertEqual(payload, {"trips": [], "total_km": 0.0})
+
+
+class ImportPeopleJsonTests(TestCase):
+    def test_reimport_inserts_nothing_and_skips_bad_labels(self):
+        people = {"people": [{
+            "name": "Alice", "device_id": "dev-1",
+            "series": {"ts": ["10:00", "10:05", "soon", "2026-01-01T08:00:00"], "hr": [70, 71, 72, 73]},
+            "path": [{"lat": 1, "lon": 2}] * 4 + [{"lat": 3, "lon": 4}, {"lat": 5, "lon": 6, "ts": "11:00"}],
+        }]}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "people.json")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(orjson.dumps(people).decode())
+
+            outputs = []
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", RuntimeWarning)  # naive datetimes
+                for _ in range(2):
+                    out = StringIO()
+                    call_command("import_people_json", path, stdout=out)
+                    outputs.append(out.getvalue())
+
+        self.assertIn("readings=4, skipped=2", outputs[0])
+        self.assertIn("readings=0, skipped=2", outputs[1])
+        self.assertEqual(Reading.objects.count(), 4)
+        self.assertTrue(all(timezone.is_aware(ts) for ts in Reading.objects.values_list("ts", flat=True)))
+
+
+class QueueConsoleHandlerTests(TestCase):
+    @skipUnless(hasattr(os, "fork"), "needs fork()")
+    def test_forked_child_writes_its_records(self):
+        read_fd, write_fd = os.pipe()
+        stream = os.fdopen(write_fd, "w")
+        handler = QueueConsoleHandler(stream=stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        # the parent starts its listener before forking, like gunicorn --preload
+        handler.handle(logging.makeLogRecord({"msg": "parent"}))
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                handler.handle(logging.makeLogRecord({"msg": "child"}))
+                handler.close()
+                stream.flush()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        handler.close()
+        stream.close()
+        with os.fdopen(read_fd) as f:
+            self.assertEqual(sorted(f.read().split()), ["child", "parent"])
+
+
+class MockPersonTests(TestCase):
+    def test_duplicate_id_returns_first_entry(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "people.json")
+        with open(path, "wb") as f:
+            f.write(orjson.dumps({"people": [
+                {"id": 1, "name": "first"}, {"id": 2, "name": "other"}, {"id": 1, "name": "second"},
+            ]}))
+        patcher = mock.patch.object(views, "_PEOPLE_JSON_PATH", Path(path))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        views._MOCK_BUNDLE = None
+        self.addCleanup(setattr, views, "_MOCK_BUNDLE", None)
+        self.client.force_login(User.objects.create_user("u", password="p"))
+
+        r = self.client.get("/api/mock/person/1/")
+        self.assertEqual(orjson.loads(r.content)["name"], "first")
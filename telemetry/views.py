@@ -1,50 +1,95 @@
 # telemetry/views.py
 from __future__ import annotations
 
-import json
 import logging
-import os
 import csv
+import hashlib
 import math
-from io import StringIO
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime, timezone, timedelta, date
+from functools import lru_cache
+from io import StringIO
 from pathlib import Path
-from collections import deque
+from types import SimpleNamespace
+from collections import OrderedDict, deque
 from typing import Any, Iterable
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
+from django.core.cache import cache
 from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import IntegrityError, connections, transaction
+from django.dispatch import receiver
 from django.contrib import messages
-from django.contrib.auth import login, update_session_auth_hash
+from django.contrib.auth import login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordResetForm
 from django.contrib.auth.models import User
 from django.http import (
-    JsonResponse,
     Http404,
     FileResponse,
     HttpResponseBadRequest,
     HttpResponse,
+    StreamingHttpResponse,
 )
 from django.shortcuts import render, redirect
 from django.utils import timezone as dj_tz
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+from django.utils.safestring import mark_safe
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_GET, require_http_methods
+from django.views.decorators.http import conditional_page, require_GET, require_http_methods
 
-from .models import Device, Reading
+from .models import Device, Reading, UserProfile
+from .duckdb_utils import get_duckdb_conn, get_duckdb_path
 
-from .models import Device, Reading
-from .duckdb_utils import get_duckdb_conn
 
-from django.shortcuts import render, redirect
-from django.contrib.auth.decorators import login_required
-from django.contrib.auth import authenticate, login, logout   # ← ADD logout here
-from django.views.decorators.http import require_GET
 
+log = logging.getLogger(__name__)
 
+# Pooled, keep-alive session for all gateway calls, shared by request threads.
+# Transient 502/503/504s are retried; the last response is still returned.
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.1,
+        status_forcelist=[502, 503, 504],
+        raise_on_status=False,
+    ),
+)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# Connect timeout for gateway calls; the read timeout is VITALS_API_TIMEOUT.
+_CONNECT_TIMEOUT = 2
+
+# Long-lived workers for the api_current_recent fan-out, so a poll doesn't
+# pay for starting (and tearing down) its own threads. Sized for a few
+# concurrent polls plus the odd straggler still refreshing the cache.
+_FANOUT_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="fanout")
+
+# JSON in and out goes through orjson; anything it cannot encode natively
+# (Decimal, lazy translation strings, ...) falls back to DjangoJSONEncoder.
+_json_default = DjangoJSONEncoder().default
+
+
+class OrjsonResponse(HttpResponse):
+    """JsonResponse counterpart that encodes with orjson (any JSON value)."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(orjson.dumps(data, default=_json_default), **kwargs)
 
-log = logging.getLogger(__name__)
 
 # ----------------------------- AUTH -----------------------------
 
@@ -59,13 +104,19 @@ def signup(request):
                 "registration/signup.html",
                 {"error": "Username and password are required."},
             )
-        if User.objects.filter(username=username).exists():
+        # The unique constraint on username is the existence check: one
+        # INSERT, and no window between checking and creating.
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=username[:150], password=password
+                )
+        except IntegrityError:
             return render(
                 request,
                 "registration/signup.html",
                 {"error": "Username already taken."},
             )
-        user = User.objects.create_user(username=username, password=password)
         login(request, user)
         return redirect("dashboard")
     return render(request, "registration/signup.html")
@@ -109,55 +160,149 @@ def logout_view(request):
 # -------------------------- DOWNLOADS --------------------------
 
 
+_XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+# (EXCEL_DIR, its mtime_ns, newest workbook path) from the last listing
+_LATEST_WORKBOOK: tuple[Path, int, Path | None] | None = None
+
+
+def _latest_workbook(excel_dir: Path) -> Path | None:
+    """
+    Newest vitals_YYYY-MM-DD.xlsx in excel_dir. The directory is only
+    re-listed when its own mtime changes (a workbook was created, renamed
+    or removed); otherwise this is a single stat().
+    """
+    global _LATEST_WORKBOOK
+    try:
+        dir_mtime = excel_dir.stat().st_mtime_ns
+    except OSError:
+        raise Http404("EXCEL_DIR does not exist.")
+    cached = _LATEST_WORKBOOK
+    if cached and cached[0] == excel_dir and cached[1] == dir_mtime:
+        return cached[2]
+    # The greatest name is the newest day, so one pass over the listing
+    # finds it (no list, no sort, no stat per file).
+    latest = max(excel_dir.glob("vitals_*.xlsx"), key=lambda p: p.name, default=None)
+    _LATEST_WORKBOOK = (excel_dir, dir_mtime, latest)
+    return latest
+
+
 @login_required
 def download_latest_workbook(request):
     excel_dir = Path(getattr(settings, "EXCEL_DIR", Path.cwd()))
-    if not excel_dir.exists():
-        raise Http404("EXCEL_DIR does not exist.")
-    xlsxs = sorted(excel_dir.glob("vitals_*.xlsx"))
-    if not xlsxs:
+    latest = _latest_workbook(excel_dir)
+    if latest is None:
         raise Http404("No workbook found in EXCEL_DIR.")
-    latest = xlsxs[-1]
-    return FileResponse(open(latest, "rb"), as_attachment=True, filename=latest.name)
+
+    # Validators from one stat(): a client that already has this version
+    # (If-None-Match / If-Modified-Since) gets a 304 instead of the file.
+    st = latest.stat()
+    mtime = int(st.st_mtime)
+    etag = f'"{mtime}-{st.st_size}"'
+    not_modified = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if not_modified is not None:
+        not_modified["ETag"] = etag
+        not_modified["Last-Modified"] = http_date(mtime)
+        return not_modified
+
+    # Behind nginx: hand the transfer to an `internal` location aliased to
+    # EXCEL_DIR, so no worker streams the bytes at all.
+    accel_prefix = getattr(settings, "EXCEL_XACCEL_PREFIX", "")
+    if accel_prefix:
+        response = HttpResponse(content_type=_XLSX_CONTENT_TYPE)
+        response["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + latest.name
+        response["Content-Disposition"] = content_disposition_header(True, latest.name)
+    else:
+        response = FileResponse(open(latest, "rb"), as_attachment=True, filename=latest.name)
+        # 1 MiB reads instead of the 4 KiB default (also the wsgi.file_wrapper
+        # block size when the server offloads the file)
+        response.block_size = 1 << 20
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    return response
 
 
 
 # ---------------------------- MOCK -----------------------------
 
 
-def _mock_people_json():
-    path = (
-        Path(__file__).resolve().parent.parent
-        / "static"
-        / "data"
-        / "people.json"
-    )
-    if not path.exists():
+_PEOPLE_JSON_PATH = (
+    Path(__file__).resolve().parent.parent / "static" / "data" / "people.json"
+)
+
+# Parsed people.json, kept per process:
+# (checked_at, (mtime_ns, size), data, {str(id): person bytes}, serialized payload bytes)
+_MOCK_BUNDLE: tuple | None = None
+_MOCK_RECHECK_SECONDS = 5.0
+
+
+def _mock_bundle():
+    """
+    Return (data, index, raw) for static/data/people.json. The file is read
+    and parsed once; after that it is only stat()ed, at most every
+    _MOCK_RECHECK_SECONDS, and re-read when its mtime or size changes.
+    """
+    global _MOCK_BUNDLE
+    now = time.monotonic()
+    bundle = _MOCK_BUNDLE
+    if bundle and now - bundle[0] < _MOCK_RECHECK_SECONDS:
+        return bundle[2:]
+
+    path = _PEOPLE_JSON_PATH
+    try:
+        st = path.stat()
+    except OSError:
         raise Http404("static/data/people.json not found")
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    # size as well as mtime: a rewrite within the filesystem's timestamp
+    # granularity still shows up as a different size in most cases
+    version = (st.st_mtime_ns, st.st_size)
+
+    if bundle and bundle[1] == version:
+        _MOCK_BUNDLE = (now, *bundle[1:])
+        return bundle[2:]
+
+    with open(path, "rb") as f:
+        data = orjson.loads(f.read())
+    # Each person is serialized here, once, so a lookup is a dict hit and
+    # the response body is ready-made bytes. A duplicated id resolves to
+    # its first entry, as a scan of the list would.
+    index = {}
+    for p in data.get("people", []):
+        if isinstance(p, dict):
+            key = str(p.get("id"))
+            if key not in index:
+                index[key] = orjson.dumps(p, default=_json_default)
+    raw = orjson.dumps(data, default=_json_default)
+    _MOCK_BUNDLE = (now, version, data, index, raw)
+    return data, index, raw
 
 
 @login_required
 @require_GET
 def api_mock_people(request):
-    return JsonResponse(_mock_people_json())
+    return HttpResponse(_mock_bundle()[2], content_type="application/json")
 
 
 @login_required
 @require_GET
 def api_mock_person(request, pid: str):
-    data = _mock_people_json()
-    for p in data.get("people", []):
-        if str(p.get("id")) == str(pid):
-            return JsonResponse(p)
-    raise Http404("Person not found")
+    person = _mock_bundle()[1].get(str(pid))
+    if person is None:
+        raise Http404("Person not found")
+    return HttpResponse(person, content_type="application/json")
 
 
 # ------------------------ Helpers ------------------------------
 
 
-def _to_float(v):
+# None and plain numbers (the common cases in gateway JSON) are handled
+# without entering the try/except.
+def _to_float(v, _num=(int, float)):
+    if v is None:
+        return None
+    if isinstance(v, _num):
+        return float(v)
     try:
         return float(v)
     except (TypeError, ValueError):
@@ -165,39 +310,89 @@ def _to_float(v):
 
 
 def _to_int(v):
+    if v is None:
+        return None
+    if type(v) is int:
+        return v
     try:
         return int(v)
     except (TypeError, ValueError):
         return None
 
 
-def _parse_ts_iso(s: str | None):
-    if not s:
-        return None
+_UTC = timezone.utc
+
+# Gateways echo the same timestamp strings poll after poll (and across
+# fields), so string parses are memoized; datetimes are immutable, so the
+# cached objects are safe to share.
+@lru_cache(maxsize=4096)
+def _parse_iso_cached(s: str):
     try:
-        return datetime.fromisoformat(str(s).replace("Z", "+00:00")).astimezone(
-            timezone.utc
-        )
+        # Python 3.11+ parses a trailing "Z" itself (C fast path, no string
+        # copy) and returns tzinfo=timezone.utc, which needs no conversion.
+        try:
+            dt = datetime.fromisoformat(s)
+        except ValueError:
+            dt = datetime.fromisoformat(s.replace("Z", "+00:00"))
+        return dt if dt.tzinfo is _UTC else dt.astimezone(_UTC)
     except Exception:
         return None
 
 
+@lru_cache(maxsize=4096)
+def _parse_ts_str(s: str):
+    # Only all-digit strings are epoch seconds; ISO strings (and "1.5e9",
+    # "-5", "nan"...) never go through a float() that can only fail or
+    # misread them.
+    if s.isdigit():
+        try:
+            return datetime.fromtimestamp(float(s), _UTC)
+        except (ValueError, OverflowError, OSError):
+            pass
+    return _parse_iso_cached(s)
+
+
+def _parse_date(raw: str) -> date | None:
+    """
+    Query-string date as YYYY-MM-DD or DD-MM-YYYY; None if it is neither.
+    The usual zero-padded forms are sliced directly; anything else goes
+    through strptime, which also takes unpadded fields like 2024-5-1.
+    """
+    if len(raw) == 10:
+        if raw[4] == "-" and raw[7] == "-":
+            y, m, d = raw[:4], raw[5:7], raw[8:]
+        elif raw[2] == "-" and raw[5] == "-":
+            d, m, y = raw[:2], raw[3:5], raw[6:]
+        else:
+            y = m = d = ""
+        digits = y + m + d
+        if digits.isascii() and digits.isdigit():
+            try:
+                return date(int(y), int(m), int(d))
+            except ValueError:
+                return None
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(raw, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
 def _parse_ts_any(ts_raw):
     """Accept ISO, epoch number, or numeric string."""
     if ts_raw is None or ts_raw == "":
         return None
     if isinstance(ts_raw, (int, float)):
         try:
-            return datetime.fromtimestamp(float(ts_raw), tz=timezone.utc)
+            return datetime.fromtimestamp(ts_raw, _UTC)
         except Exception:
             return None
+    if isinstance(ts_raw, datetime):
+        # e.g. DuckDB TIMESTAMP columns: same result as parsing str(ts_raw)
+        return ts_raw if ts_raw.tzinfo is _UTC else ts_raw.astimezone(_UTC)
     s = str(ts_raw).strip()
-    if s.isdigit():
-        try:
-            return datetime.fromtimestamp(float(s), tz=timezone.utc)
-        except Exception:
-            pass
-    return _parse_ts_iso(s)
+    return _parse_ts_str(s) if s else None
 
 
 def _sanitize_ts(ts: datetime | None):
@@ -220,34 +415,35 @@ def _shape_to_list(obj: Any) -> list[dict]:
     {"dev1":{...},"dev2":{...}}?,
     {"body":"<json>"} (API Gateway), or stringified JSON.
     """
-    import json as _json
-
     if obj is None:
         return []
 
+    # Decoded JSON objects are always plain dicts, so an exact class check
+    # stands in for isinstance() in the per-row filters.
     if isinstance(obj, dict):
         # API Gateway proxy: body can be string JSON
-        if "body" in obj and isinstance(obj["body"], str):
+        body = obj.get("body")
+        if body.__class__ is str:
             try:
-                return _shape_to_list(_json.loads(obj["body"]))
+                return _shape_to_list(orjson.loads(body))
             except Exception:
                 return []
 
-        if isinstance(obj.get("items"), list):
-            return [x for x in obj["items"] if isinstance(x, dict)]
-        if isinstance(obj.get("Items"), list):
-            return [x for x in obj["Items"] if isinstance(x, dict)]
+        rows = obj.get("items")
+        if rows.__class__ is not list:
+            rows = obj.get("Items")
+        if rows.__class__ is list:
+            return [x for x in rows if x.__class__ is dict]
 
         # dict-of-dicts
-        vals = list(obj.values())
-        return [v for v in vals if isinstance(v, dict)]
+        return [v for v in obj.values() if v.__class__ is dict]
 
     if isinstance(obj, list):
-        return [x for x in obj if isinstance(x, dict)]
+        return [x for x in obj if x.__class__ is dict]
 
     if isinstance(obj, str):
         try:
-            return _shape_to_list(_json.loads(obj))
+            return _shape_to_list(orjson.loads(obj))
         except Exception:
             return []
 
@@ -255,12 +451,41 @@ def _shape_to_list(obj: Any) -> list[dict]:
 
 
 def _pick(data: dict, *keys, default=None):
+    get = data.get
     for k in keys:
-        if k in data and data[k] is not None:
-            return data[k]
+        v = get(k)
+        if v is not None:
+            return v
     return default
 
 
+def _first(data: dict, keys: tuple[str, ...]):
+    """_pick without *args packing or a default: for fixed alias tuples."""
+    for k in keys:
+        v = data.get(k)
+        if v is not None:
+            return v
+    return None
+
+
+# Key aliases for gateway registry rows, as used by api_current_recent.
+_ROW_TS_KEYS = ("last_seen", "lastSeen", "ts_iso", "timestamp", "ts")
+_ROW_LAT_KEYS = ("lat", "last_lat", "latitude")
+_ROW_LON_KEYS = ("lon", "last_lon", "longitude")
+_GPS_LAT_KEYS = ("lat", "latitude")
+_GPS_LON_KEYS = ("lon", "longitude")
+_ROW_ID_KEYS = ("device_id", "deviceId", "node_id", "id")
+_ROW_LABEL_KEYS = ("label", "person")
+# (output key, keys on the row, key in its nested "data" block)
+_ROW_VITALS = (
+    ("hr", ("hr",), "hr"),
+    ("spo2", ("spo2",), "spo2"),
+    ("temp", ("temp_c", "temp"), "temp"),
+    ("bp_sys", ("bp_sys",), "bp_sys"),
+    ("bp_dia", ("bp_dia",), "bp_dia"),
+)
+
+
 def _merge_rows_into(items: list[dict], rows: Iterable[dict], cutoff_utc: datetime):
     """
     Merge rows from a live API into the unified items list.
@@ -326,67 +551,123 @@ def _merge_rows_into(items: list[dict], rows: Iterable[dict], cutoff_utc: dateti
 # ----- TRACKING HELPERS (distance + trip grouping) -----
 
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """
-    Returns distance in kilometres between two lat/lon points.
-    """
-    R = 6371.0  # Earth radius in km
-
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
+# Optional: with numba installed, long tracks are summed in one compiled
+# loop. Short ones stay in Python, where conversion would cost more than
+# it saves.
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    _path_km_jit = _trip_split_jit = None
+else:
+
+    @njit(fastmath=True, cache=True)
+    def _path_km_jit(lats, lons):
+        total = 0.0
+        for i in range(1, lats.shape[0]):
+            phi1 = math.radians(lats[i - 1])
+            phi2 = math.radians(lats[i])
+            s_phi = math.sin((phi2 - phi1) / 2)
+            s_lam = math.sin(math.radians(lons[i] - lons[i - 1]) / 2)
+            a = s_phi * s_phi + math.cos(phi1) * math.cos(phi2) * s_lam * s_lam
+            total += math.asin(math.sqrt(min(1.0, a)))
+        return 2 * 6371.0 * total
+
+    @njit(fastmath=True, cache=True)
+    def _trip_split_jit(ts, lats, lons, gap):
+        """
+        One pass over a day's sorted points: (starts, ends, km) per run of
+        points with no time gap over `gap` seconds.
+        """
+        n = ts.shape[0]
+        starts = np.empty(n, np.int64)
+        ends = np.empty(n, np.int64)
+        km = np.empty(n, np.float64)
+        k = 0
+        start = 0
+        total = 0.0
+        for i in range(1, n + 1):
+            if i == n or ts[i] - ts[i - 1] > gap:
+                starts[k] = start
+                ends[k] = i
+                km[k] = 2 * 6371.0 * total
+                k += 1
+                start = i
+                total = 0.0
+            else:
+                phi1 = math.radians(lats[i - 1])
+                phi2 = math.radians(lats[i])
+                s_phi = math.sin((phi2 - phi1) / 2)
+                s_lam = math.sin(math.radians(lons[i] - lons[i - 1]) / 2)
+                a = s_phi * s_phi + math.cos(phi1) * math.cos(phi2) * s_lam * s_lam
+                total += math.asin(math.sqrt(min(1.0, a)))
+        return starts[:k], ends[:k], km[:k]
 
-    a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+_JIT_MIN_POINTS = 256
 
 
-def _build_segment_from_readings(readings: list[Reading], seg_index: int) -> dict:
+def _path_km(lats: list[float], lons: list[float]) -> float:
     """
-    Build a single trip segment dict from a list of Reading rows.
+    Total haversine length in kilometres of the polyline through the given
+    points. Radians and cos(lat) are computed once per point (not once per
+    leg end), and each leg is summed as asin(sqrt(a)), scaled once at the
+    end.
     """
-    total_km = 0.0
-    coords: list[dict] = []
-    prev_lat: float | None = None
-    prev_lon: float | None = None
-
-    for r in readings:
-        if r.lat is None or r.lon is None:
-            continue
-
-        lat = float(r.lat)
-        lon = float(r.lon)
-        local_ts = dj_tz.localtime(r.ts)
-
-        coords.append(
-            {
-                "lat": lat,
-                "lng": lon,
-                "time": local_ts.strftime("%H:%M:%S"),
-            }
+    if len(lats) < 2:
+        return 0.0
+    if _path_km_jit is not None and len(lats) > _JIT_MIN_POINTS:
+        return float(
+            _path_km_jit(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
         )
+    rad, cos, sin, asin, sqrt = math.radians, math.cos, math.sin, math.asin, math.sqrt
+    phis = [rad(v) for v in lats]
+    lams = [rad(v) for v in lons]
+    cos_phis = [cos(v) for v in phis]
 
-        if prev_lat is not None and prev_lon is not None:
-            total_km += _haversine_km(prev_lat, prev_lon, lat, lon)
+    total = 0.0
+    for phi1, phi2, lam1, lam2, c1, c2 in zip(
+        phis, phis[1:], lams, lams[1:], cos_phis, cos_phis[1:]
+    ):
+        s_phi = sin((phi2 - phi1) / 2)
+        s_lam = sin((lam2 - lam1) / 2)
+        total += asin(sqrt(min(1.0, s_phi * s_phi + c1 * c2 * s_lam * s_lam)))
+    return 2 * 6371.0 * total
 
-        prev_lat, prev_lon = lat, lon
 
-    if not coords:
+def _build_segment_from_readings(readings: list[Reading], seg_index: int) -> dict:
+    """
+    Build a single trip segment dict from a list of Reading rows (or any
+    rows with ts/lat/lon attributes, e.g. values_list(named=True)).
+    Points are columnar: parallel "lat", "lng" and "time" lists rather
+    than one dict per point.
+    """
+    located = [r for r in readings if r.lat is not None and r.lon is not None]
+    if not located:
         return {}
 
-    start_local = dj_tz.localtime(readings[0].ts)
-    end_local = dj_tz.localtime(readings[-1].ts)
+    lats = [float(r.lat) for r in located]
+    lons = [float(r.lon) for r in located]
+    total_km = _path_km(lats, lons)
+
+    # One timezone lookup per segment; times are formatted from the
+    # datetime fields directly rather than through strftime.
+    tz = dj_tz.get_current_timezone()
+    times = []
+    for r in located:
+        lt = r.ts.astimezone(tz)
+        times.append(f"{lt.hour:02d}:{lt.minute:02d}:{lt.second:02d}")
+
+    start_local = readings[0].ts.astimezone(tz)
+    end_local = readings[-1].ts.astimezone(tz)
 
     return {
         "id": seg_index,
-        "start_time": start_local.strftime("%H:%M"),
-        "end_time": end_local.strftime("%H:%M"),
+        "start_time": f"{start_local.hour:02d}:{start_local.minute:02d}",
+        "end_time": f"{end_local.hour:02d}:{end_local.minute:02d}",
         "distance_km": round(total_km, 2),
-        "points": coords,
+        "lat": lats,
+        "lng": lons,
+        "time": times,
     }
 
 
@@ -401,25 +682,17 @@ def _build_trip_segments_from_readings(
     if not readings:
         return segments
 
-    current: list[Reading] = []
-    prev_ts: datetime | None = None
+    # Trip boundaries first (indices where the gap to the previous reading
+    # exceeds max_gap_minutes), then one slice per trip: no per-reading
+    # list building or branching.
     gap = timedelta(minutes=max_gap_minutes)
+    ts = [r.ts for r in readings]
+    cuts = [i for i, (a, b) in enumerate(zip(ts, ts[1:]), 1) if b - a > gap]
 
-    for r in readings:
-        ts = r.ts
-        if prev_ts is not None and (ts - prev_ts) > gap:
-            if len(current) >= 2:
-                seg = _build_segment_from_readings(current, len(segments) + 1)
-                if seg:
-                    segments.append(seg)
-            current = []
-
-        current.append(r)
-        prev_ts = ts
-
-    # close last trip
-    if len(current) >= 2:
-        seg = _build_segment_from_readings(current, len(segments) + 1)
+    for start, end in zip([0, *cuts], [*cuts, len(readings)]):
+        if end - start < 2:
+            continue
+        seg = _build_segment_from_readings(readings[start:end], len(segments) + 1)
         if seg:
             segments.append(seg)
 
@@ -429,80 +702,257 @@ def _build_trip_segments_from_readings(
 # --------------------- CLOUD API PROXIES -----------------------
 
 
+@lru_cache(maxsize=1)
+def _gateway_cfg() -> SimpleNamespace:
+    """
+    Gateway settings used by the proxy and live-data views, read and
+    normalized once per process instead of through LazySettings on every
+    request.
+    """
+    secret = (
+        getattr(settings, "VITALS_API_SECRET", "")
+        or getattr(settings, "VITALS_SECRET", "")
+        or ""
+    ).strip()
+    return SimpleNamespace(
+        devices_url=(getattr(settings, "VITALS_DEVICES_URL", "") or "").strip(),
+        base_url=(getattr(settings, "VITALS_API_URL", "") or "").strip(),
+        gsm_url=(
+            (getattr(settings, "VITALS_GSM_DEVICES_URL", "") or "").strip()
+            or (getattr(settings, "VITALS_GSM_API_URL", "") or "").strip()
+        ),
+        headers={"x-ingest-secret": secret} if secret else {},
+        timeout=int(getattr(settings, "VITALS_API_TIMEOUT", 10)),
+        devices_max_age=int(getattr(settings, "DEVICES_MAX_AGE_MIN", 10)),
+        min_poll=int(getattr(settings, "VITALS_MIN_POLL_SECONDS", 3)),
+    )
+
+
+@receiver(setting_changed)
+def _reset_gateway_cfg(**kwargs):
+    _gateway_cfg.cache_clear()
+
+
 @login_required
 @require_GET
 def api_devices(request):
-    devices_url = (getattr(settings, "VITALS_DEVICES_URL", "") or "").strip()
+    cfg = _gateway_cfg()
+    devices_url = cfg.devices_url
     if not devices_url:
-        return JsonResponse([], safe=False)
+        return OrjsonResponse([])
 
-    mins = int(
-        request.GET.get(
-            "active_minutes", getattr(settings, "DEVICES_MAX_AGE_MIN", 10)
-        )
-    )
-    headers = (
-        {"x-ingest-secret": settings.VITALS_API_SECRET}
-        if getattr(settings, "VITALS_API_SECRET", "")
-        else {}
-    )
+    mins = int(request.GET.get("active_minutes", cfg.devices_max_age))
     try:
-        r = requests.get(
+        with _SESSION.get(
             devices_url,
             params={"active_minutes": mins},
-            headers=headers,
-            timeout=getattr(settings, "VITALS_API_TIMEOUT", 10),
-        )
-        if r.ok:
-            return JsonResponse(r.json(), safe=False)
-        log.warning(
-            "api_devices proxy failed %s -> %s body=%s",
-            r.url,
-            r.status_code,
-            r.text[:300],
-        )
-    except requests.RequestException:
+            headers=cfg.headers,
+            timeout=(_CONNECT_TIMEOUT, cfg.timeout),
+            stream=True,
+        ) as r:
+            body = _read_capped(r)
+        if body is None:
+            log.warning("api_devices proxy body over %d bytes, dropped", _MAX_UPSTREAM_BYTES)
+        elif r.ok:
+            return OrjsonResponse(orjson.loads(body))
+        else:
+            log.warning(
+                "api_devices proxy failed %s -> %s body=%s",
+                r.url,
+                r.status_code,
+                body[:300].decode("utf-8", "replace"),
+            )
+    except (requests.RequestException, ValueError):
         log.exception("api_devices proxy error")
-    return JsonResponse([], safe=False)
+    return OrjsonResponse([])
 
 
 @login_required
 @require_GET
 def api_readings(request):
-    base_url = (getattr(settings, "VITALS_API_URL", "") or "").strip()
+    cfg = _gateway_cfg()
+    base_url = cfg.base_url
     if not base_url:
-        return JsonResponse([], safe=False)
+        return OrjsonResponse([])
 
     device_id = request.GET.get("device_id")
     limit = int(request.GET.get("limit", 50))
-    headers = (
-        {"x-ingest-secret": settings.VITALS_API_SECRET}
-        if getattr(settings, "VITALS_API_SECRET", "")
-        else {}
-    )
     try:
-        r = requests.get(
+        with _SESSION.get(
             base_url,
             params={"device_id": device_id, "limit": str(limit)},
-            headers=headers,
-            timeout=getattr(settings, "VITALS_API_TIMEOUT", 10),
-        )
-        if r.ok:
-            return JsonResponse(r.json(), safe=False)
-        log.warning(
-            "api_readings proxy failed %s -> %s body=%s",
-            r.url,
-            r.status_code,
-            r.text[:300],
-        )
-    except requests.RequestException:
+            headers=cfg.headers,
+            timeout=(_CONNECT_TIMEOUT, cfg.timeout),
+            stream=True,
+        ) as r:
+            body = _read_capped(r)
+        if body is None:
+            log.warning("api_readings proxy body over %d bytes, dropped", _MAX_UPSTREAM_BYTES)
+        elif r.ok:
+            return OrjsonResponse(orjson.loads(body))
+        else:
+            log.warning(
+                "api_readings proxy failed %s -> %s body=%s",
+                r.url,
+                r.status_code,
+                body[:300].decode("utf-8", "replace"),
+            )
+    except (requests.RequestException, ValueError):
         log.exception("api_readings proxy error")
-    return JsonResponse([], safe=False)
+    return OrjsonResponse([])
 
 
 # ------------------------ RECENT DEVICES API -------------------
 
 
+def _stream_json_items(items: Iterable[dict], batch: int = 200):
+    """
+    Yield {"items": [...]} as JSON in chunks of `batch` items, so the body
+    is never held as one serialized string next to the item list.
+    """
+    yield b'{"items":['
+    chunk: list[bytes] = []
+    first = True
+    for it in items:
+        chunk.append(orjson.dumps(it, default=_json_default))
+        if len(chunk) >= batch:
+            yield (b"" if first else b",") + b",".join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield (b"" if first else b",") + b",".join(chunk)
+    yield b"]}"
+
+
+# Upstream bodies larger than this are dropped rather than buffered.
+_MAX_UPSTREAM_BYTES = 4 * 1024 * 1024
+
+
+def _read_capped(r: requests.Response, limit: int = _MAX_UPSTREAM_BYTES):
+    """
+    Body of a stream=True response, or None once it is known to exceed
+    `limit` (from Content-Length, or while reading), so a runaway upstream
+    costs at most `limit` bytes of memory. The body is returned as the
+    bytearray it was read into; orjson parses that directly, so there is
+    no second full-size copy.
+    """
+    try:
+        if int(r.headers.get("Content-Length") or 0) > limit:
+            return None
+    except ValueError:
+        pass
+    buf = bytearray()
+    for chunk in r.iter_content(64 * 1024):
+        buf += chunk
+        if len(buf) > limit:
+            return None
+    return buf
+
+
+def _fetch_rows(
+    name: str, url: str, headers: dict, timeout: int, params: dict | None = None
+) -> list[dict] | None:
+    """
+    GET one gateway endpoint through the pooled session and return its rows
+    (see _shape_to_list). Any failure is logged and yields None, so one bad
+    upstream never takes the others down with it.
+    """
+    try:
+        with _SESSION.get(
+            url,
+            headers=headers,
+            params=params,
+            timeout=(_CONNECT_TIMEOUT, timeout),
+            stream=True,
+        ) as r:
+            log.info("%s GET %s -> %s", name, r.url, r.status_code)
+            body = _read_capped(r)
+        if body is None:
+            log.warning("%s body over %d bytes, dropped", name, _MAX_UPSTREAM_BYTES)
+        elif r.ok:
+            return _shape_to_list(orjson.loads(body) if body else {})
+        else:
+            log.warning("%s body: %s", name, body[:500].decode("utf-8", "replace"))
+    except (requests.RequestException, ValueError):
+        log.exception("%s fetch failed", name)
+    return None
+
+
+# Single-flight for gateway GETs: concurrent dashboard polls asking for the
+# same URL share one upstream request, and its rows are reused for a short
+# window after it completes. Key -> (completed_at or None, Future).
+_INFLIGHT: dict[tuple, tuple[float | None, Future]] = {}
+_INFLIGHT_LOCK = threading.Lock()
+_COALESCE_WINDOW = 0.25  # seconds
+
+
+def _fetch_rows_coalesced(
+    name: str, url: str, headers: dict, timeout: int, params: dict | None = None
+) -> list[dict] | None:
+    key = (url, tuple(sorted((params or {}).items())))
+    with _INFLIGHT_LOCK:
+        entry = _INFLIGHT.get(key)
+        if entry and (
+            entry[0] is None or time.monotonic() - entry[0] < _COALESCE_WINDOW
+        ):
+            fut, owner = entry[1], False
+        else:
+            fut, owner = Future(), True
+            _INFLIGHT[key] = (None, fut)
+
+    if owner:
+        try:
+            fut.set_result(_fetch_rows(name, url, headers, timeout, params))
+        except BaseException as exc:
+            fut.set_exception(exc)
+            raise
+        finally:
+            with _INFLIGHT_LOCK:
+                _INFLIGHT[key] = (time.monotonic(), fut)
+    # Callers only read the shared rows (merge_rows builds new dicts).
+    return fut.result()
+
+
+# Gateway rows are also kept in the Django cache (Redis when REDIS_URL is
+# set, so all workers share it): a fresh copy answers polls for a few
+# seconds, and a long-lived stale copy is served when the upstream fails.
+_ROWS_FRESH_TTL = 5  # seconds
+_ROWS_STALE_TTL = 600  # seconds
+
+
+def _rows_cache_keys(url: str, params: dict | None) -> tuple[str, str]:
+    digest = hashlib.blake2b(
+        repr((url, sorted((params or {}).items()))).encode(), digest_size=16
+    ).hexdigest()
+    return f"vitals:rows:{digest}", f"vitals:rows:{digest}:stale"
+
+
+def _fetch_rows_cached(
+    name: str, url: str, headers: dict, timeout: int, params: dict | None = None
+) -> tuple[list[dict], bool]:
+    """
+    Return (rows, stale). stale is True when the upstream failed and the
+    rows are the last good copy; ([], False) when there is none.
+    """
+    fresh_key, stale_key = _rows_cache_keys(url, params)
+
+    rows = cache.get(fresh_key)
+    if rows is not None:
+        return rows, False
+
+    rows = _fetch_rows_coalesced(name, url, headers, timeout, params)
+    if rows is not None:
+        cache.set(fresh_key, rows, _ROWS_FRESH_TTL)
+        cache.set(stale_key, rows, _ROWS_STALE_TTL)
+        return rows, False
+
+    rows = cache.get(stale_key)
+    if rows is not None:
+        log.warning("%s unavailable, serving %d cached rows", name, len(rows))
+        return rows, True
+    return [], False
+
+
 @login_required
 @require_GET
 def api_current_recent(request):
@@ -516,196 +966,202 @@ def api_current_recent(request):
     This version ensures that all devices are shown on the map,
     even if their 'ts' is old — it uses last_seen or ts_iso as the current timestamp.
     """
-    # ---- Active minutes ----
-    try:
-        override = request.GET.get("active_minutes")
-        max_age_min = (
-            int(override)
-            if override
-            else int(getattr(settings, "DEVICES_MAX_AGE_MIN", 10))
-        )
-    except (TypeError, ValueError):
-        max_age_min = int(getattr(settings, "DEVICES_MAX_AGE_MIN", 10))
+    cfg = _gateway_cfg()
 
-    cutoff = dj_tz.now().astimezone(timezone.utc) - timedelta(minutes=max_age_min)
-    items: list[dict] = []
+    # Items are de-duplicated by device_id as they are produced: each source
+    # offers its item (without "ts") with the datetime it already parsed,
+    # and only the newest per device is kept. No second pass, no
+    # re-parsing of ts, and no ISO string for items that lose.
+    latest_by_id: dict[str, tuple[datetime, dict]] = {}
+
+    def offer(ts: datetime, it: dict) -> None:
+        dev_id = str(it.get("device_id") or "").strip()
+        if not dev_id:
+            return
+        it["device_id"] = dev_id
+        it["label"] = (it.get("label") or dev_id).strip()
+        prev = latest_by_id.get(dev_id)
+        if prev is None or ts > prev[0]:
+            latest_by_id[dev_id] = (ts, it)
 
     # ==========================================================
-    # A) Local ingest cache
+    # B/C/D) Gateway registries
     # ==========================================================
-    global _RECENT_CACHE
-    cache_vals = []
-    try:
-        cache_vals = list(_RECENT_CACHE.values())
-    except NameError:
-        pass
-
-    for it in cache_vals:
-        ts = it.get("ts")
-        if isinstance(ts, datetime):
-            ts_utc = _sanitize_ts(ts.astimezone(timezone.utc))
-        else:
-            ts_utc = _sanitize_ts(_parse_ts_any(ts))
-        if not ts_utc:
-            continue
-
-        lat = _to_float(it.get("lat"))
-        lon = _to_float(it.get("lon"))
-        if lat is None or lon is None:
-            continue
-
-        dev_id = it.get("device_id")
-        label = it.get("label") or dev_id
-        items.append(
-            {
-                "device_id": dev_id,
-                "person_id": dev_id,
-                "person": label,
-                "label": label,
-                "lat": lat,
-                "lon": lon,
-                "hr": it.get("hr"),
-                "spo2": it.get("spo2"),
-                "temp": it.get("temp_c"),
-                "bp_sys": it.get("bp_sys"),
-                "bp_dia": it.get("bp_dia"),
-                "ts": ts_utc.isoformat(),
-            }
-        )
+    devices_url = cfg.devices_url
+    base_url = cfg.base_url
+    gsm_url = cfg.gsm_url
+    timeout = cfg.timeout
+    headers = cfg.headers
+
+    stale = False
+
+    def fetch(name: str, url: str, params: dict | None = None) -> list[dict]:
+        nonlocal stale
+        rows, was_stale = _fetch_rows_cached(name, url, headers, timeout, params)
+        stale = stale or was_stale
+        return rows
+
+    # The whole fan-out shares one deadline, however slow (or retried) the
+    # individual GETs are. A source that misses it is answered from its
+    # last good copy and left to finish in the background, refreshing the
+    # cache for the next poll.
+    deadline = time.monotonic() + timeout + _CONNECT_TIMEOUT
+
+    def wait(fut: Future, name: str, url: str, params: dict | None = None) -> list[dict]:
+        nonlocal stale
+        try:
+            return fut.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            rows = cache.get(_rows_cache_keys(url, params)[1]) or []
+            log.warning("%s missed the deadline, serving %d cached rows", name, len(rows))
+            stale = stale or bool(rows)
+            return rows
 
     # ==========================================================
-    # B) Cloud LoRa registry (/vitals/devices)
+    # A) Local ingest cache
     # ==========================================================
-    devices_url = (getattr(settings, "VITALS_DEVICES_URL", "") or "").strip()
-    base_url = (getattr(settings, "VITALS_API_URL", "") or "").strip()
-    secret = (
-        getattr(settings, "VITALS_API_SECRET", "")
-        or getattr(settings, "VITALS_SECRET", "")
-        or ""
-    ).strip()
-    timeout = int(getattr(settings, "VITALS_API_TIMEOUT", 10))
-    headers = {"x-ingest-secret": secret} if secret else {}
+    def merge_ingest_cache():
+        """Offer the devices POSTed to /ingest/v1 (this process only)."""
+        with _RECENT_CACHE_LOCK:
+            cache_vals = list(_RECENT_CACHE.values())
+
+        for it in cache_vals:
+            g = it.get
+            # stored as an aware UTC datetime by ingest_vitals
+            ts_utc = _sanitize_ts(g("ts"))
+            if not ts_utc:
+                continue
+
+            lat = _to_float(g("lat"))
+            lon = _to_float(g("lon"))
+            if lat is None or lon is None:
+                continue
+
+            dev_id = g("device_id")
+            label = g("label") or dev_id
+            offer(
+                ts_utc,
+                {
+                    "device_id": dev_id,
+                    "person_id": dev_id,
+                    "person": label,
+                    "label": label,
+                    "lat": lat,
+                    "lon": lon,
+                    "hr": g("hr"),
+                    "spo2": g("spo2"),
+                    "temp": g("temp_c"),
+                    "bp_sys": g("bp_sys"),
+                    "bp_dia": g("bp_dia"),
+                },
+            )
 
     def merge_rows(rows: list[dict]):
-        """Internal helper to append normalized items from AWS JSON."""
+        """Internal helper to offer normalized items from AWS JSON."""
+        first = _first
         for it in rows or []:
             # ✅ prefer last_seen or ts_iso (they are newest)
-            ts_raw = _pick(
-                it,
-                "last_seen",
-                "lastSeen",
-                "ts_iso",
-                "timestamp",
-                "ts",
-            )
-            ts = _sanitize_ts(_parse_ts_any(ts_raw))
+            ts = _sanitize_ts(_parse_ts_any(first(it, _ROW_TS_KEYS)))
             if not ts:
                 continue
 
-            lat = _to_float(_pick(it, "lat", "last_lat", "latitude"))
-            lon = _to_float(_pick(it, "lon", "last_lon", "longitude"))
+            lat = _to_float(first(it, _ROW_LAT_KEYS))
+            lon = _to_float(first(it, _ROW_LON_KEYS))
             if lat is None or lon is None:
                 gps = it.get("gps") or {}
-                lat = _to_float(_pick(gps, "lat", "latitude"))
-                lon = _to_float(_pick(gps, "lon", "longitude"))
+                lat = _to_float(first(gps, _GPS_LAT_KEYS))
+                lon = _to_float(first(gps, _GPS_LON_KEYS))
             if lat is None or lon is None:
                 continue
 
-            dev_id = _pick(it, "device_id", "deviceId", "node_id", "id")
-            label = _pick(it, "label", "person", default=dev_id)
+            dev_id = first(it, _ROW_ID_KEYS)
+            label = first(it, _ROW_LABEL_KEYS)
+            if label is None:
+                label = dev_id
             data_blk = it.get("data") or {}
 
-            items.append(
-                {
-                    "device_id": dev_id,
-                    "person_id": dev_id,
-                    "person": label,
-                    "label": label,
-                    "lat": lat,
-                    "lon": lon,
-                    "hr": _pick(it, "hr", default=_pick(data_blk, "hr")),
-                    "spo2": _pick(it, "spo2", default=_pick(data_blk, "spo2")),
-                    "temp": _pick(it, "temp_c", "temp", default=_pick(data_blk, "temp")),
-                    "bp_sys": _pick(it, "bp_sys", default=_pick(data_blk, "bp_sys")),
-                    "bp_dia": _pick(it, "bp_dia", default=_pick(data_blk, "bp_dia")),
-                    "ts": ts.isoformat(),
-                }
-            )
+            item = {
+                "device_id": dev_id,
+                "person_id": dev_id,
+                "person": label,
+                "label": label,
+                "lat": lat,
+                "lon": lon,
+            }
+            # the nested data block is only looked at when the row lacks the key
+            for out, keys, blk_key in _ROW_VITALS:
+                v = first(it, keys)
+                item[out] = v if v is not None else data_blk.get(blk_key)
+            offer(ts, item)
+
+    # All independent GETs go out before any local work: the LoRa registry
+    # and the GSM registry run at once, and when there is no registry to
+    # wait for, the LoRa bulk fallback starts right away too. The ingest
+    # cache is merged while they are in flight, so the request costs the
+    # slowest upstream, not the sum of everything. Results are still
+    # merged in the fixed source order, so ties resolve the same way on
+    # every poll.
+    bulk_params = {"limit": "50"}
+    submit = _FANOUT_POOL.submit
+    registry_f = submit(fetch, "AWS registry", devices_url) if devices_url else None
+    gsm_f = submit(fetch, "GSM registry", gsm_url) if gsm_url else None
+    bulk_f = (
+        submit(fetch, "LoRa bulk", base_url, bulk_params)
+        if base_url and not devices_url
+        else None
+    )
 
-    registry_ok = False
-    if devices_url:
-        try:
-            r = requests.get(devices_url, headers=headers, timeout=timeout)
-            log.info("AWS registry GET %s -> %s", r.url, r.status_code)
-            if r.ok:
-                rows = _shape_to_list(r.json() if r.content else {})
-                if rows:
-                    merge_rows(rows)
-                    registry_ok = True
-            else:
-                log.warning("AWS registry body: %s", (r.text or "")[:500])
-        except requests.RequestException:
-            log.exception("AWS registry fetch failed")
+    merge_ingest_cache()
+
+    registry_rows = wait(registry_f, "AWS registry", devices_url) if registry_f else []
+    merge_rows(registry_rows)
 
     # ==========================================================
     # C) LoRa fallbacks (/vitals or per-device)
     # ==========================================================
-    if base_url and not registry_ok:
-        try:
-            r = requests.get(base_url, headers=headers, params={"limit": "50"}, timeout=timeout)
-            if r.ok:
-                rows = _shape_to_list(r.json() if r.content else {})
-                merge_rows(rows)
-        except requests.RequestException:
-            log.exception("LoRa bulk fetch failed")
+    if base_url and not registry_rows:
+        if bulk_f is None:
+            bulk_f = submit(fetch, "LoRa bulk", base_url, bulk_params)
+        merge_rows(wait(bulk_f, "LoRa bulk", base_url, bulk_params))
 
     # ==========================================================
     # D) GSM registry (vitals_latest_gsm)
     # ==========================================================
-    gsm_devices_url = (getattr(settings, "VITALS_GSM_DEVICES_URL", "") or "").strip()
-    gsm_base_url = (getattr(settings, "VITALS_GSM_API_URL", "") or "").strip()
-    gsm_url = gsm_devices_url or gsm_base_url
+    # Stragglers that missed the deadline keep running on the shared pool;
+    # their results only feed the cache.
+    if gsm_f:
+        merge_rows(wait(gsm_f, "GSM registry", gsm_url))
 
-    if gsm_url:
-        try:
-            r = requests.get(gsm_url, headers=headers, timeout=timeout)
-            log.info("GSM registry GET %s -> %s", r.url, r.status_code)
-            if r.ok:
-                rows = _shape_to_list(r.json() if r.content else {})
-                merge_rows(rows)
-        except requests.RequestException:
-            log.exception("GSM registry fetch failed")
-
-    # ----------------------------------------------------------
-    # E) Normalize and de-duplicate by device_id
-    # ----------------------------------------------------------
-    latest_by_id: dict[str, dict] = {}
-    for it in items:
-        dev_id = str(it.get("device_id") or "").strip()
-        if not dev_id:
-            continue
-        label = (it.get("label") or dev_id).strip()
-        it["device_id"] = dev_id
-        it["label"] = label
-
-        ts = _parse_ts_any(it.get("ts"))
-        if not ts:
-            continue
-
-        prev = latest_by_id.get(dev_id)
-        if not prev:
-            latest_by_id[dev_id] = it
-        else:
-            prev_ts = _parse_ts_any(prev.get("ts"))
-            if not prev_ts or ts > prev_ts:
-                latest_by_id[dev_id] = it
-
-    items = list(latest_by_id.values())
+    winners = list(latest_by_id.values())
 
     # ----------------------------------------------------------
     # Final payload
     # ----------------------------------------------------------
-    return JsonResponse({"items": items})
+    # Clients may ask for a slower cadence with ?poll=N (never below
+    # VITALS_MIN_POLL_SECONDS); the ETag lets them revalidate for a 304.
+    min_poll = cfg.min_poll
+    poll_seconds = max(min_poll, _to_int(request.GET.get("poll")) or min_poll)
+
+    # Weak ETag over every field of every item (vitals included, so values
+    # corrected under the same ts still change it), decided without
+    # serializing the payload or rendering a single ts.
+    fingerprint = repr([(ts, tuple(it.items())) for ts, it in winners])
+    etag = 'W/"%s"' % hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        items = []
+        for ts, it in winners:
+            it["ts"] = ts.isoformat()
+            items.append(it)
+        response = StreamingHttpResponse(
+            _stream_json_items(items), content_type="application/json"
+        )
+    response["ETag"] = etag
+    # private: the payload is per logged-in user, so shared proxies skip it
+    response["Cache-Control"] = f"private, max-age={poll_seconds}"
+    if stale:
+        response["X-Cache"] = "STALE"
+    return response
 
 
 # ✅ LEGACY WRAPPER (for old URL /api/current/)
@@ -721,6 +1177,12 @@ def api_current_all(request):
 
 # ---------------------- LOCAL INGEST (POST) --------------------
 
+# Latest POSTed entry per device, oldest-updated first; capped so a stream
+# of distinct device ids cannot grow it without bound.
+_RECENT_CACHE: OrderedDict[str, dict] = OrderedDict()
+_RECENT_CACHE_MAX = 1024
+_RECENT_CACHE_LOCK = threading.Lock()
+
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -730,31 +1192,25 @@ def ingest_vitals(request):
     Accepts node_id OR device_id and optional label.
     """
     if request.headers.get("x-ingest-secret", "") != settings.INGEST_SECRET:
-        return JsonResponse({"error": "unauthorized"}, status=401)
+        return OrjsonResponse({"error": "unauthorized"}, status=401)
 
     try:
-        payload = json.loads(request.body or "{}")
+        body = request.body
+        payload = orjson.loads(body) if body else {}
     except Exception:
-        return JsonResponse({"error": "invalid json"}, status=400)
+        return OrjsonResponse({"error": "invalid json"}, status=400)
 
     device_id = (
         (payload.get("device_id") or payload.get("node_id") or payload.get("id") or "").strip()
     )
     if not device_id:
-        return JsonResponse({"error": "device_id required"}, status=400)
+        return OrjsonResponse({"error": "device_id required"}, status=400)
 
     # For ingest, if timestamp is missing we use "now" (device is online right now).
     ts = _parse_ts_any(payload.get("timestamp")) or dj_tz.now().astimezone(
-        timezone.utc
+        _UTC
     )
 
-    # Minimal in-memory cache
-    global _RECENT_CACHE
-    try:
-        _RECENT_CACHE
-    except NameError:
-        _RECENT_CACHE = {}
-
     def _fi(k, default=None):
         try:
             return float(payload.get(k))
@@ -782,26 +1238,72 @@ def ingest_vitals(request):
         "ts": ts,
     }
 
-    _RECENT_CACHE[device_id] = entry
-    return JsonResponse({"ok": True})
+    with _RECENT_CACHE_LOCK:
+        _RECENT_CACHE[device_id] = entry
+        _RECENT_CACHE.move_to_end(device_id)
+        if len(_RECENT_CACHE) > _RECENT_CACHE_MAX:
+            _RECENT_CACHE.popitem(last=False)
+    return OrjsonResponse({"ok": True})
 
 
 # ---------------------- TEMP TEST POSTBOX ----------------------
 
 
-_POSTBOX = deque(maxlen=50)
+_POSTBOX_SIZE = 50
+_POSTBOX_KEY = "aiaero:postbox"
+# Larger POSTs are refused from Content-Length, before the body is read.
+_POSTBOX_MAX_BYTES = 64 * 1024
+
+# Per-process ring buffer, used when REDIS_URL is unset. With Redis the
+# buffer is a capped list shared by every worker (needs redis-py).
+_POSTBOX = deque(maxlen=_POSTBOX_SIZE)
+_POSTBOX_REDIS = None
+
+
+def _postbox_redis():
+    global _POSTBOX_REDIS
+    if _POSTBOX_REDIS is None and settings.REDIS_URL:
+        import redis
+
+        _POSTBOX_REDIS = redis.Redis.from_url(settings.REDIS_URL)
+    return _POSTBOX_REDIS
 
 
 @csrf_exempt
 def postbox_ingest(request):
+    r = _postbox_redis()
     if request.method == "POST":
         try:
-            payload = json.loads(request.body or "{}")
+            size = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return HttpResponseBadRequest("invalid Content-Length")
+        if size > _POSTBOX_MAX_BYTES:
+            return HttpResponse("payload too large", status=413)
+        try:
+            body = request.body
+            payload = orjson.loads(body) if body else {}
         except Exception:
             return HttpResponseBadRequest("invalid JSON")
-        _POSTBOX.appendleft({"ts": dj_tz.now().isoformat(), "payload": payload})
-        return JsonResponse({"ok": True, "count": len(_POSTBOX)})
-    return JsonResponse({"items": list(_POSTBOX)})
+        entry = {"ts": dj_tz.now().isoformat(), "payload": payload}
+        if r is None:
+            _POSTBOX.appendleft(entry)
+            return OrjsonResponse({"ok": True, "count": len(_POSTBOX)})
+        pipe = r.pipeline()
+        pipe.lpush(_POSTBOX_KEY, orjson.dumps(entry))
+        pipe.ltrim(_POSTBOX_KEY, 0, _POSTBOX_SIZE - 1)
+        pipe.llen(_POSTBOX_KEY)
+        _, _, count = pipe.execute()
+        return OrjsonResponse({"ok": True, "count": count})
+    if r is None:
+        # snapshot first: POSTs may rotate the deque while the body streams
+        return StreamingHttpResponse(
+            _stream_json_items(list(_POSTBOX)), content_type="application/json"
+        )
+    # Redis already holds each entry as JSON; splice it in without decoding.
+    raw = r.lrange(_POSTBOX_KEY, 0, _POSTBOX_SIZE - 1)
+    return HttpResponse(
+        b'{"items":[' + b",".join(raw) + b"]}", content_type="application/json"
+    )
 
 
 # ---------------------- PROFILE & PASSWORD ---------------------
@@ -817,6 +1319,25 @@ def profile(request):
     return render(request, "registration/profile.html", {"user_obj": request.user})
 
 
+# Reset emails (token, template rendering, SMTP) are sent off the request
+# thread so a slow mail server never holds a worker.
+_MAIL_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mail")
+_PWRESET_INTERVAL = 60
+
+
+def _send_password_reset(form: PasswordResetForm, **kwargs) -> None:
+    try:
+        form.save(
+            email_template_name="registration/password_reset_email.html",
+            subject_template_name="registration/password_reset_subject.txt",
+            **kwargs,
+        )
+    except Exception:
+        log.exception("password reset email failed")
+    finally:
+        connections.close_all()
+
+
 @login_required
 @require_http_methods(["GET", "POST"])
 def password_change_request(request):
@@ -829,13 +1350,19 @@ def password_change_request(request):
     if request.method == "POST":
         form = PasswordResetForm({"email": request.user.email})
         if form.is_valid():
-            form.save(
-                request=request,
+            # One email per user per minute, however often the button is hit.
+            if not cache.add(
+                f"pwreset:{request.user.pk}", 1, timeout=_PWRESET_INTERVAL
+            ):
+                messages.info(
+                    request, "A reset email was sent recently; check your inbox."
+                )
+                return redirect("password_reset_done")
+            _MAIL_POOL.submit(
+                _send_password_reset,
+                form,
+                domain_override=request.get_host(),
                 use_https=request.is_secure(),
-                email_template_name="registration/password_reset_email.html",
-                subject_template_name=(
-                    "registration/password_reset_subject.txt"
-                ),
             )
             return redirect("password_reset_done")
         messages.error(request, "Could not send email. Please try again.")
@@ -853,6 +1380,58 @@ def password_change_request(request):
 
 # ---------------------- DAILY TRACK HISTORY (LOCAL DUCKDB: LoRa + GSM) ----------------------
 
+# Timestamp and coordinate columns api_track_history reads, in the order
+# it prefers them
+_TRACK_TS_COLUMNS = ("ts_iso", "timestamp", "ts", "ts_epoch")
+_TRACK_LAT_KEYS = ("lat", "last_lat", "latitude", "Latitude")
+_TRACK_LON_KEYS = ("lon", "last_lon", "longitude", "Longitude")
+_NUMERIC_TYPES = {
+    "TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT",
+    "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT",
+    "FLOAT", "REAL", "DOUBLE",
+}
+
+
+def _near_day_sql(con, table: str, day: date) -> tuple[str, list]:
+    """
+    A WHERE condition (and its params) letting DuckDB drop rows that cannot
+    be on `day` before they are fetched. A row passes when any of its
+    timestamp columns is within a day of `day`, which keeps every row the
+    exact check in Python would; ("TRUE", []) when a column's type (e.g.
+    text) can't be judged in SQL.
+    """
+    types = dict(
+        con.execute(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = ?",
+            [table],
+        ).fetchall()
+    )
+    lo = day - timedelta(days=1)
+    hi = day + timedelta(days=2)
+    epoch_lo = (lo - date(1970, 1, 1)).days * 86400
+    epoch_hi = (hi - date(1970, 1, 1)).days * 86400
+
+    conds: list[str] = []
+    params: list = []
+    for col in _TRACK_TS_COLUMNS:
+        typ = types.get(col)
+        if typ is None:
+            continue
+        typ = typ.upper()
+        if typ.startswith("TIMESTAMP") or typ == "DATE":
+            conds.append(f'("{col}" >= ? AND "{col}" < ?)')
+            params += [lo, hi]
+        elif typ in _NUMERIC_TYPES or typ.startswith("DECIMAL"):
+            conds.append(f'("{col}" >= ? AND "{col}" < ?)')
+            params += [epoch_lo, epoch_hi]
+        else:
+            return "TRUE", []
+    if not conds:
+        return "TRUE", []
+    return "(" + " OR ".join(conds) + ")", params
+
+
 
 @login_required
 @require_GET
@@ -871,18 +1450,21 @@ def api_track_history(request, device_id: str):
     # ---- Parse date from query ----
     date_str = (request.GET.get("date") or "").strip()
     if not date_str:
-        return JsonResponse({"error": "date=YYYY-MM-DD required"}, status=400)
-
-    target_date: date | None = None
-    for fmt in ("%Y-%m-%d", "%d-%m-%Y"):
-        try:
-            target_date = datetime.strptime(date_str, fmt).date()
-            break
-        except ValueError:
-            continue
+        return OrjsonResponse({"error": "date=YYYY-MM-DD required"}, status=400)
 
+    target_date = _parse_date(date_str)
     if target_date is None:
-        return JsonResponse({"error": "invalid date format"}, status=400)
+        return OrjsonResponse({"error": "invalid date format"}, status=400)
+
+    # Rows from other days are dropped before any datetime is built: epoch
+    # seconds by their UTC day number, ISO strings by their date prefix.
+    # Parsed times are converted to UTC, so a string's own (local) date can
+    # be a day either side of the one that counts; those still get parsed.
+    # Anything else (datetimes, numeric strings, ...) takes the slow path.
+    near_days = {
+        (target_date + timedelta(days=d)).isoformat() for d in (-1, 0, 1)
+    }
+    target_day = (target_date - date(1970, 1, 1)).days
 
     # ---- Collect rows from both history tables ----
     collected: list[dict] = []
@@ -896,9 +1478,10 @@ def api_track_history(request, device_id: str):
             for tbl in history_tables:
                 try:
                     # some tables may not exist yet -> just skip if so
+                    day_sql, day_params = _near_day_sql(con, tbl, target_date)
                     cur = con.execute(
-                        f"SELECT * FROM {tbl} WHERE device_id = ?",
-                        [device_id],
+                        f"SELECT * FROM {tbl} WHERE device_id = ? AND {day_sql}",
+                        [device_id, *day_params],
                     )
                 except Exception:
                     log.exception("api_track_history: DuckDB table %s not available", tbl)
@@ -907,23 +1490,41 @@ def api_track_history(request, device_id: str):
                 cols = [c[0] for c in cur.description]
                 raw_rows = cur.fetchall()
 
+                # A table's columns are the same for every row, so the
+                # aliases it doesn't have are dropped once, up front.
+                have = set(cols)
+                ts_keys = tuple(k for k in _TRACK_TS_COLUMNS if k in have)
+                lat_keys = tuple(k for k in _TRACK_LAT_KEYS if k in have)
+                lon_keys = tuple(k for k in _TRACK_LON_KEYS if k in have)
+
                 for raw in raw_rows:
                     rec = dict(zip(cols, raw))
 
                     # pick any timestamp field we can find
-                    ts_val = (
-                        rec.get("ts_iso")
-                        or rec.get("timestamp")
-                        or rec.get("ts")
-                        or rec.get("ts_epoch")
-                    )
+                    ts_val = None
+                    for k in ts_keys:
+                        ts_val = rec[k]
+                        if ts_val:
+                            break
+                    cls = ts_val.__class__
+                    if cls is str:
+                        if (
+                            len(ts_val) >= 10
+                            and ts_val[4] == "-"
+                            and ts_val[7] == "-"
+                            and ts_val[:10] not in near_days
+                        ):
+                            continue
+                    elif cls is int or cls is float:
+                        if ts_val // 86400 != target_day:
+                            continue
                     ts = _sanitize_ts(_parse_ts_any(ts_val))
                     if not ts or ts.date() != target_date:
                         continue
 
                     # lat / lon can have multiple possible names
-                    lat = _to_float(_pick(rec, "lat", "last_lat", "latitude", "Latitude"))
-                    lon = _to_float(_pick(rec, "lon", "last_lon", "longitude", "Longitude"))
+                    lat = _to_float(_first(rec, lat_keys))
+                    lon = _to_float(_first(rec, lon_keys))
                     if lat is None or lon is None:
                         gps = rec.get("gps") or {}
                         lat = _to_float(_pick(gps, "lat", "latitude", "Latitude"))
@@ -947,7 +1548,7 @@ def api_track_history(request, device_id: str):
                     )
     except Exception:
         log.exception("api_track_history: DuckDB query failed")
-        return JsonResponse({"items": []})
+        return OrjsonResponse({"items": []})
 
     # ---- Sort by time and build JSON payload ----
     collected.sort(key=lambda r: r["ts"])
@@ -965,13 +1566,117 @@ def api_track_history(request, device_id: str):
             }
         )
 
-    return JsonResponse({"items": out})
+    return OrjsonResponse({"items": out})
 
 
 # ---------------------- DAILY TRACK – MAIN PAGE (LOCAL DUCKDB DEVICES) ----------------------
 
+# Pre-serialized, already-safe JSON for templates that still embed
+# {{ trip_segments_json }}: nothing to encode or escape per render.
+_EMPTY_TRIPS_JSON = mark_safe("[]")
+
+# Where tracking_page finds device ids, in priority order: the latest
+# tables (with labels), then the history tables (ids only).
+_TRACKING_DEVICE_SOURCES = tuple(
+    (
+        table,
+        f"SELECT DISTINCT {src} AS src, device_id, {label} AS label "
+        f"FROM {table} WHERE device_id IS NOT NULL",
+    )
+    for src, (table, label) in enumerate(
+        (
+            ("vitals_latest", "label"),
+            ("vitals_latest_gsm", "label"),
+            ("aiaero_4444_secure_key", "NULL::VARCHAR"),
+            ("vitals_readings", "NULL::VARCHAR"),
+        )
+    )
+)
+
+
+def _tracking_device_rows() -> list[tuple]:
+    """
+    (src, device_id, label) rows from every DuckDB source that exists,
+    ordered by source priority.
+    """
+    # All sources go out as one UNION ALL, so DuckDB scans them in a single
+    # statement instead of four round trips. Tables that don't exist yet are
+    # left out up front; if the combined query still fails, each source is
+    # tried on its own so one bad table doesn't hide the rest.
+    rows: list[tuple] = []
+    try:
+        with get_duckdb_conn() as con:
+            present = {
+                name
+                for (name,) in con.execute(
+                    "SELECT table_name FROM information_schema.tables "
+                    "WHERE table_schema = current_schema()"
+                ).fetchall()
+            }
+            parts = [sql for table, sql in _TRACKING_DEVICE_SOURCES if table in present]
+            missing = [table for table, _ in _TRACKING_DEVICE_SOURCES if table not in present]
+            if missing:
+                log.info("tracking devices: DuckDB tables not available: %s", ", ".join(missing))
+            if parts:
+                try:
+                    rows = con.execute(" UNION ALL ".join(parts) + " ORDER BY src").fetchall()
+                except Exception:
+                    log.exception("tracking devices: combined device query failed")
+                    for sql in parts:
+                        try:
+                            rows.extend(con.execute(sql).fetchall())
+                        except Exception:
+                            log.exception("tracking devices: DuckDB device source failed")
+    except Exception:
+        log.exception("tracking devices: DuckDB device query failed")
+    return rows
+
+
+def _request_org_id(request) -> int | None:
+    """
+    Organization id of the logged-in user's profile, or None. One query
+    for the id alone (no profile or organization instances), remembered on
+    the request for any later caller.
+    """
+    try:
+        return request._org_id
+    except AttributeError:
+        pass
+    user = request.user
+    org_id = None
+    if user.is_authenticated:
+        org_id = (
+            UserProfile.objects.filter(user_id=user.pk)
+            .values_list("organization_id", flat=True)
+            .first()
+        )
+    request._org_id = org_id
+    return org_id
+
+
+def _device_choices(pairs: Iterable[tuple]) -> list[dict]:
+    """
+    Dropdown entries from (device_id, label) pairs: blank ids are skipped,
+    the first label seen for an id wins, and the list is sorted by label
+    then id, case-insensitively.
+    """
+    devices: list[dict] = []
+    seen: set[str] = set()
+    for dev_id, label in pairs:
+        if not dev_id:
+            continue
+        dev_id = str(dev_id).strip()
+        if not dev_id or dev_id in seen:
+            continue
+        seen.add(dev_id)
+        devices.append({"device_id": dev_id, "label": (label or dev_id).strip()})
+    # the key is built once per device, not per comparison
+    devices.sort(key=lambda x: (x["label"].lower(), x["device_id"].lower()))
+    return devices
+
 
 @login_required
+@conditional_page
 def tracking_page(request):
     """
     Route tracking UI.
@@ -987,84 +1692,33 @@ def tracking_page(request):
     (api_track_history)
     """
 
-    devices: list[dict] = []
-    seen: set[str] = set()
-
-    def add_device(dev_id: str | None, label: str | None = None):
-        if not dev_id:
-            return
-        dev_id = str(dev_id).strip()
-        if not dev_id or dev_id in seen:
-            return
-        label = (label or dev_id).strip()
-        devices.append({"device_id": dev_id, "label": label})
-        seen.add(dev_id)
-
     # ---- Pull devices from DuckDB ----
-    try:
-        with get_duckdb_conn() as con:
-            # 1) Latest LoRa
-            try:
-                cur = con.execute(
-                    "SELECT DISTINCT device_id, label FROM vitals_latest "
-                    "WHERE device_id IS NOT NULL"
-                )
-                for dev_id, label in cur.fetchall():
-                    add_device(dev_id, label)
-            except Exception:
-                log.exception("tracking_page: DuckDB vitals_latest not available")
-
-            # 2) Latest GSM
-            try:
-                cur = con.execute(
-                    "SELECT DISTINCT device_id, label FROM vitals_latest_gsm "
-                    "WHERE device_id IS NOT NULL"
-                )
-                for dev_id, label in cur.fetchall():
-                    add_device(dev_id, label)
-            except Exception:
-                log.exception("tracking_page: DuckDB vitals_latest_gsm not available")
-
-            # 3) LoRa history
-            try:
-                cur = con.execute(
-                    "SELECT DISTINCT device_id FROM aiaero_4444_secure_key "
-                    "WHERE device_id IS NOT NULL"
-                )
-                for (dev_id,) in cur.fetchall():
-                    add_device(dev_id)
-            except Exception:
-                log.exception("tracking_page: DuckDB aiaero_4444_secure_key not available")
-
-            # 4) GSM history
-            try:
-                cur = con.execute(
-                    "SELECT DISTINCT device_id FROM vitals_readings "
-                    "WHERE device_id IS NOT NULL"
-                )
-                for (dev_id,) in cur.fetchall():
-                    add_device(dev_id)
-            except Exception:
-                log.exception("tracking_page: DuckDB vitals_readings not available")
-    except Exception:
-        log.exception("tracking_page: DuckDB device query failed")
+    # The list changes rarely, so it is reused, deduped and sorted, for a
+    # short while across page loads. Only the DuckDB list is cached; the
+    # per-organization Device fallback below is always computed fresh.
+    cache_key = "tracking:device-list:" + hashlib.blake2b(
+        get_duckdb_path().encode(), digest_size=16
+    ).hexdigest()
+    devices = cache.get(cache_key)
+    if devices is None:
+        devices = _device_choices(
+            (dev_id, label) for _src, dev_id, label in _tracking_device_rows()
+        )
+        if devices:
+            cache.set(cache_key, devices, settings.TRACKING_DEVICES_CACHE_SECONDS)
 
     # ---- Final fallback: local Django Device model ----
     if not devices:
         try:
-            org = getattr(getattr(request.user, "profile", None), "organization", None)
+            org_id = _request_org_id(request)
             qs = Device.objects.all()
-            if org:
-                qs = qs.filter(organization=org)
-            qs = qs.order_by("label", "device_id")[:200]
-            for d in qs:
-                add_device(d.device_id, d.label or d.device_id)
+            if org_id:
+                qs = qs.filter(organization_id=org_id)
+            qs = qs.order_by("label", "device_id").values_list("device_id", "label")[:200]
+            devices = _device_choices((dev_id, label or dev_id) for dev_id, label in qs)
         except Exception:
             log.exception("tracking_page: local Device fallback failed")
 
-    # Sort for dropdown
-    devices.sort(key=lambda x: (x["label"].lower(), x["device_id"].lower()))
-
     # ---- Selected device + date from query (for pre-fill only) ----
     selected_device_id = (request.GET.get("device_id") or "").strip()
     if not selected_device_id and devices:
@@ -1076,14 +1730,7 @@ def tracking_page(request):
     selected_date_display = ""    # dd-mm-yyyy for summary text
 
     if date_raw:
-        dt = None
-        for fmt in ("%Y-%m-%d", "%d-%m-%Y"):
-            try:
-                dt = datetime.strptime(date_raw, fmt).date()
-                break
-            except ValueError:
-                continue
-
+        dt = _parse_date(date_raw)
         if dt:
             selected_date_input = dt.strftime("%Y-%m-%d")
             selected_date_display = dt.strftime("%d-%m-%Y")
@@ -1103,7 +1750,7 @@ def tracking_page(request):
         "selected_date_display": selected_date_display,
         # not used by new JS, kept for compatibility:
         "trip_segments": [],
-        "trip_segments_json": "[]",
+        "trip_segments_json": _EMPTY_TRIPS_JSON,
         "total_km": "0.0",
     }
     return render(request, "telemetry/tracking.html", ctx)
@@ -1111,145 +1758,148 @@ def tracking_page(request):
 
 # ---------------------- DAILY TRACK – JSON API (DuckDB) ----------------------
 
-
-@login_required
-@require_GET
-def api_tracking(request):
-    """
-    JSON endpoint that returns trip segments for a device + date,
-    using local DuckDB history tables.
-
-    NOTE: Your current tracking.html uses /api/track/<device_id>/ (api_track_history).
-    This api_tracking() is provided for any pages that expect the
-    {trips: [...], total_km: X} structure.
+# One day of points for a device, per history table (LoRa, then GSM). The
+# statements are built once; every request runs them on a cursor of the
+# process-wide DuckDB connection. Coordinates are converted to DOUBLE and
+# incomplete points dropped inside DuckDB, so rows arrive ready to use.
+_TRACK_POINTS_SQL = {
+    table_name: f"""
+        SELECT ts, lat, lon
+        FROM (
+            SELECT
+                COALESCE(ts_iso, to_timestamp(ts_epoch)) AS ts,
+                TRY_CAST(lat AS DOUBLE) AS lat,
+                TRY_CAST(lon AS DOUBLE) AS lon
+            FROM {table_name}
+            WHERE device_id = ?
+              AND date(COALESCE(ts_iso, to_timestamp(ts_epoch))) = ?
+        )
+        WHERE ts IS NOT NULL
+          AND lat IS NOT NULL
+          AND lon IS NOT NULL
+        ORDER BY ts
     """
+    for table_name in ("aiaero_4444_secure_key", "vitals_readings")
+}
 
-    device_id = (request.GET.get("device_id") or "").strip()
-    date_raw = (request.GET.get("date") or "").strip()
-
-    if not device_id:
-        return JsonResponse({"error": "device_id required"}, status=400)
-    if not date_raw:
-        return JsonResponse({"error": "date required"}, status=400)
-
-    # Parse date (accept dd-mm-yyyy or yyyy-mm-dd)
-    target_date: date | None = None
-    for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
-        try:
-            target_date = datetime.strptime(date_raw, fmt).date()
-            break
-        except ValueError:
-            continue
-
-    if target_date is None:
-        return JsonResponse({"error": "invalid date format"}, status=400)
 
+def _compute_trip_payload(device_id: str, target_date: date) -> dict:
+    """
+    {"trips": [...], "total_km": X} for one device and day, from the local
+    DuckDB history. Pages that need trips call this directly instead of
+    going through the api_tracking endpoint.
+    """
     # ----- Fetch history points from DuckDB (LoRa + GSM) -----
     rows = []
     try:
         with get_duckdb_conn() as con:
-            def _fetch_from(table_name: str):
+            for table_name, q in _TRACK_POINTS_SQL.items():
                 try:
-                    q = f"""
-                        SELECT
-                            COALESCE(ts_iso, to_timestamp(ts_epoch)) AS ts,
-                            lat,
-                            lon
-                        FROM {table_name}
-                        WHERE device_id = ?
-                          AND date(COALESCE(ts_iso, to_timestamp(ts_epoch))) = ?
-                          AND lat IS NOT NULL
-                          AND lon IS NOT NULL
-                        ORDER BY ts
-                    """
-                    return con.execute(q, [device_id, target_date]).fetchall()
+                    rows.extend(con.execute(q, [device_id, target_date]).fetchall())
                 except Exception as e:
-                    log.warning("api_tracking: skip table %s (%s)", table_name, e)
-                    return []
-
-            # LoRa history
-            rows.extend(_fetch_from("aiaero_4444_secure_key"))
-            # GSM history
-            rows.extend(_fetch_from("vitals_readings"))
+                    log.warning("trip payload: skip table %s (%s)", table_name, e)
 
     except Exception:
-        log.exception("api_tracking: DuckDB query failed")
-        return JsonResponse({"trips": [], "total_km": 0.0})
+        log.exception("trip payload: DuckDB query failed")
+        return {"trips": [], "total_km": 0.0}
 
-    # Convert rows -> list of points with datetime
-    points: list[dict] = []
-    for ts, lat, lon in rows:
-        if ts is None or lat is None or lon is None:
-            continue
-        try:
-            points.append({"dt": ts, "lat": float(lat), "lon": float(lon)})
-        except Exception:
-            continue
+    # The two tables arrive as two ordered runs, which the sort just merges.
+    rows.sort(key=lambda r: r[0])
 
-    points.sort(key=lambda p: p["dt"])
+    # Points as parallel columns: no dict per point, and trips below are
+    # plain slices of each column.
+    dts, lats, lons = (list(col) for col in zip(*rows)) if rows else ([], [], [])
+    n = len(dts)
 
     # ----- Group into trips with max time gap -----
-    trips_raw: list[list[dict]] = []
-    current: list[dict] = []
-    last_time: datetime | None = None
+    # (start, end, km) per trip. Long days with numba installed are split
+    # and measured in one compiled pass; otherwise cut indices come from
+    # one pass over the timestamps and distances from _path_km per trip.
     MAX_GAP_MIN = 20
-
-    for p in points:
-        if not current:
-            current.append(p)
-            last_time = p["dt"]
-            continue
-
-        gap_min = (p["dt"] - last_time).total_seconds() / 60.0
-        if gap_min > MAX_GAP_MIN:
-            trips_raw.append(current)
-            current = [p]
-        else:
-            current.append(p)
-        last_time = p["dt"]
-
-    if current:
-        trips_raw.append(current)
+    if _trip_split_jit is not None and n > _JIT_MIN_POINTS:
+        starts, ends, kms = _trip_split_jit(
+            np.fromiter((d.timestamp() for d in dts), np.float64, n),
+            np.asarray(lats, dtype=np.float64),
+            np.asarray(lons, dtype=np.float64),
+            MAX_GAP_MIN * 60.0,
+        )
+        spans = zip(starts.tolist(), ends.tolist(), kms.tolist())
+    else:
+        gap = timedelta(minutes=MAX_GAP_MIN)
+        cuts = [i for i, (a, b) in enumerate(zip(dts, dts[1:]), 1) if b - a > gap]
+        spans = (
+            [(start, end, None) for start, end in zip([0, *cuts], [*cuts, n])]
+            if n
+            else []
+        )
 
     # ----- Build response payload with distances -----
     trips_payload = []
     total_km = 0.0
     trip_id = 1
 
-    for seg in trips_raw:
-        if len(seg) < 2:
+    for start, end, dist in spans:
+        if end - start < 2:
             continue
-
-        dist = 0.0
-        pts = []
-
-        for i, p in enumerate(seg):
-            pts.append(
-                {
-                    "lat": p["lat"],
-                    "lng": p["lon"],
-                    "ts": p["dt"].strftime("%H:%M:%S"),
-                }
-            )
-            if i > 0:
-                prev = seg[i - 1]
-                dist += _haversine_km(
-                    prev["lat"], prev["lon"], p["lat"], p["lon"]
-                )
+        seg_dts = dts[start:end]
+        seg_lats = lats[start:end]
+        seg_lons = lons[start:end]
+
+        if dist is None:
+            dist = _path_km(seg_lats, seg_lons)
+        # times from the datetime fields directly rather than via strftime
+        pts = [
+            {
+                "lat": lat,
+                "lng": lon,
+                "ts": f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}",
+            }
+            for dt, lat, lon in zip(seg_dts, seg_lats, seg_lons)
+        ]
+        first, last = seg_dts[0], seg_dts[-1]
 
         total_km += dist
         trips_payload.append(
             {
                 "id": trip_id,
-                "start_time": seg[0]["dt"].strftime("%H:%M"),
-                "end_time": seg[-1]["dt"].strftime("%H:%M"),
+                "start_time": f"{first.hour:02d}:{first.minute:02d}",
+                "end_time": f"{last.hour:02d}:{last.minute:02d}",
                 "distance_km": round(dist, 2),
                 "points": pts,
             }
         )
         trip_id += 1
 
-    return JsonResponse({"trips": trips_payload, "total_km": round(total_km, 2)})
+    return {"trips": trips_payload, "total_km": round(total_km, 2)}
+
+
+@login_required
+@require_GET
+@conditional_page
+def api_tracking(request):
+    """
+    JSON endpoint that returns trip segments for a device + date,
+    using local DuckDB history tables.
+
+    NOTE: Your current tracking.html uses /api/track/<device_id>/ (api_track_history).
+    This api_tracking() is provided for any pages that expect the
+    {trips: [...], total_km: X} structure.
+    """
+
+    device_id = (request.GET.get("device_id") or "").strip()
+    date_raw = (request.GET.get("date") or "").strip()
+
+    if not device_id:
+        return OrjsonResponse({"error": "device_id required"}, status=400)
+    if not date_raw:
+        return OrjsonResponse({"error": "date required"}, status=400)
+
+    # Parse date (accept dd-mm-yyyy or yyyy-mm-dd)
+    target_date = _parse_date(date_raw)
+    if target_date is None:
+        return OrjsonResponse({"error": "invalid date format"}, status=400)
+
+    return OrjsonResponse(_compute_trip_payload(device_id, target_date))
 
 
 # ---------------------- CSV DOWNLOAD FOR TRACK ----------------------
@@ -1294,53 +1944,50 @@ def api_tracking_download(request):
             ts__lt=day_end,
             lat__isnull=False,
             lon__isnull=False,
-        ).order_by("ts")
+        )
+        .order_by("ts")
+        # (ts, lat, lon) named tuples: all the trip builder reads, without
+        # hydrating a Reading per row
+        .values_list("ts", "lat", "lon", named=True)
     )
 
     trips = _build_trip_segments_from_readings(readings)
 
-    buffer = StringIO()
-    writer = csv.writer(buffer)
-
-    writer.writerow(
-        [
-            "trip_id",
-            "device_id",
-            "date",
-            "point_time",
-            "lat",
-            "lon",
-            "segment_start_time",
-            "segment_end_time",
-            "segment_distance_km",
-        ]
-    )
-
-    for seg in trips:
-        seg_id = seg.get("id")
-        seg_start = seg.get("start_time")
-        seg_end = seg.get("end_time")
-        dist = seg.get("distance_km", 0.0)
-        for p in seg.get("points", []):
-            writer.writerow(
-                [
-                    seg_id,
-                    device_id,
-                    date_str,
-                    p.get("time"),
-                    p.get("lat"),
-                    p.get("lng"),
-                    seg_start,
-                    seg_end,
-                    dist,
-                ]
+    def rows():
+        # Each trip is written with one writerows() call into a small
+        # buffer that is handed out and emptied, so the file streams in
+        # trip-sized pieces and is never held whole.
+        buf = StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(
+            [
+                "trip_id",
+                "device_id",
+                "date",
+                "point_time",
+                "lat",
+                "lon",
+                "segment_start_time",
+                "segment_end_time",
+                "segment_distance_km",
+            ]
+        )
+        for seg in trips:
+            seg_id = seg.get("id")
+            seg_start = seg.get("start_time")
+            seg_end = seg.get("end_time")
+            dist = seg.get("distance_km", 0.0)
+            writer.writerows(
+                (seg_id, device_id, date_str, point_time, lat, lng, seg_start, seg_end, dist)
+                for point_time, lat, lng in zip(seg["time"], seg["lat"], seg["lng"])
             )
-
-    csv_data = buffer.getvalue()
-    buffer.close()
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        yield buf.getvalue()
 
     filename = f"track_{device_id}_{date_str}.csv"
-    resp = HttpResponse(csv_data, content_type="text/csv")
+    resp = StreamingHttpResponse(rows(), content_type="text/csv")
     resp["Content-Disposition"] = f'attachment; filename="{filename}"'
     return resp
 
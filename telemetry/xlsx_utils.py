@@ -0,0 +1,121 @@
+# telemetry/xlsx_utils.py
+import math
+import zipfile
+from datetime import date, datetime
+from itertools import chain
+from xml.sax.saxutils import escape
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import get_column_letter
+
+# Fixed package parts of a one-sheet workbook. Style 1 is the built-in
+# "m/d/yy h:mm" format (numFmtId 22) so datetimes read back as datetimes.
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_HEAD = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    b'<sheetData>'
+)
+_SHEET_TAIL = b'</sheetData></worksheet>'
+
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# Rows are handed to the zip stream in batches of this many
+_WRITE_BATCH = 1000
+
+
+def _cell(ref: str, v) -> str:
+    if v is None or v == "":
+        return ""
+    if isinstance(v, bool):
+        return f'<c r="{ref}" t="b"><v>{int(v)}</v></c>'
+    if isinstance(v, (int, float)):
+        # NaN and +/-inf have no Excel representation; leave the cell empty
+        if isinstance(v, float) and not math.isfinite(v):
+            return ""
+        return f'<c r="{ref}"><v>{v!r}</v></c>'
+    if isinstance(v, datetime):
+        serial = (v.replace(tzinfo=None) - _EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c r="{ref}" s="1"><v>{serial!r}</v></c>'
+    if isinstance(v, date):
+        return f'<c r="{ref}" s="1"><v>{(v - _EXCEL_EPOCH.date()).days}</v></c>'
+    # control characters are not allowed in XML at all, escaped or not
+    text = escape(ILLEGAL_CHARACTERS_RE.sub("", str(v)))
+    return f'<c r="{ref}" t="inlineStr"><is><t>{text}</t></is></c>'
+
+
+def write_xlsx_fast(path, header, rows, sheet_name: str = "Sheet1"):
+    """
+    Write header + rows as a single-sheet .xlsx without building a workbook
+    in memory: the sheet XML is generated row by row straight into the zip.
+    Strings are stored inline, so `rows` can be any iterable (consumed once).
+    Row XML is buffered and written in batches, so memory stays bounded by
+    _WRITE_BATCH rows whatever the size of the export.
+    Returns the number of data rows written.
+    """
+    letters = []
+    count = 0
+    batch = []
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(sheet=escape(sheet_name, {'"': "&quot;"})))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", _STYLES)
+
+        with zf.open("xl/worksheets/sheet1.xml", "w") as f:
+            f.write(_SHEET_HEAD)
+            for r, row in enumerate(chain((header,), rows), start=1):
+                while len(letters) < len(row):
+                    letters.append(get_column_letter(len(letters) + 1))
+                cells = "".join(_cell(f"{letters[i]}{r}", v) for i, v in enumerate(row))
+                batch.append(f'<row r="{r}">{cells}</row>')
+                count = r
+                if len(batch) >= _WRITE_BATCH:
+                    f.write("".join(batch).encode("utf-8"))
+                    batch.clear()
+            f.write("".join(batch).encode("utf-8"))
+            f.write(_SHEET_TAIL)
+    return max(count - 1, 0)